@@ -0,0 +1,152 @@
+import asyncio
+import glob
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from config import (
+    BACKUP_DIR, BACKUP_KEEP, BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE,
+    BACKUP_MAX_RESTARTS, BACKUP_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "certificates.db"
+SNAPSHOT_PREFIX = "certificates-"
+SNAPSHOT_SUFFIX = ".db.gz"
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy_online(db_path, target_path, pages, pause, max_restarts, timeout):
+    """
+    Копирует базу через online backup API SQLite по pages страниц за шаг.
+    Между шагами блокировка чтения снимается, и после паузы pause писатели бота
+    успевают закоммитить свои транзакции. Коммит другого соединения перезапускает
+    копирование с начала, поэтому после max_restarts перезапусков остаток снимается
+    одним шагом (писатели ждут его в пределах busy timeout). Копирование дольше
+    timeout секунд прерывается BackupError. Возвращает (страниц, перезапусков).
+    """
+    deadline = time.monotonic() + timeout
+    steps = 0
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        # После перезапуска остаток не уменьшается относительно прошлого шага;
+        # шаги, упёршиеся в блокировку писателя (BUSY/LOCKED), не считаются
+        if status == sqlite3.SQLITE_OK:
+            if last_remaining is not None and remaining >= last_remaining:
+                restarts += 1
+            last_remaining = remaining
+        if time.monotonic() > deadline:
+            raise BackupError(f"копирование не уложилось в {timeout:.0f} с")
+        if restarts >= max_restarts:
+            raise _TooManyRestarts()
+        if remaining and pause:
+            time.sleep(pause)
+
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        except _TooManyRestarts:
+            logger.info("Копирование перезапускалось %d раз из-за записей, снимаем одним шагом", restarts)
+            source.backup(target, pages=-1)
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        result = target.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    if result != "ok":
+        raise BackupError(f"integrity_check снимка: {result}")
+    logger.debug("Снимок базы: %d страниц за %d шагов, перезапусков: %d", page_count, steps, restarts)
+    return page_count, restarts
+
+
+def _compress(raw_path, gz_path, chunk_size=1024 * 1024):
+    """Сжимает снимок в gzip и перечитывает архив, сверяя SHA-256 с исходником."""
+    digest = hashlib.sha256()
+    with open(raw_path, "rb") as src, gzip.open(gz_path, "wb") as dst:
+        while chunk := src.read(chunk_size):
+            digest.update(chunk)
+            dst.write(chunk)
+
+    check = hashlib.sha256()
+    with gzip.open(gz_path, "rb") as src:
+        while chunk := src.read(chunk_size):
+            check.update(chunk)
+    if check.digest() != digest.digest():
+        raise BackupError(f"контрольная сумма {gz_path} не совпадает со снимком")
+    return digest.hexdigest()
+
+
+def rotate_backups(backup_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+    """Удаляет все снимки, кроме keep последних (имена сортируются по времени создания)."""
+    snapshots = sorted(glob.glob(os.path.join(backup_dir, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}")))
+    removed = snapshots[:-keep]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def create_backup(db_path=DB_PATH, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP,
+                  pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE,
+                  max_restarts=BACKUP_MAX_RESTARTS, timeout=BACKUP_TIMEOUT):
+    """
+    Создаёт сжатый проверенный снимок базы без остановки бота и оставляет keep
+    последних снимков. Блокирующая функция: из обработчиков вызывать через
+    run_backup. Возвращает словарь с путём, размерами и длительностью.
+    """
+    started = time.perf_counter()
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"{SNAPSHOT_PREFIX}{datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')}{SNAPSHOT_SUFFIX}"
+    path = os.path.join(backup_dir, name)
+    raw_path = path + ".raw.tmp"
+    gz_path = path + ".tmp"
+    try:
+        page_count, restarts = _copy_online(db_path, raw_path, pages, pause, max_restarts, timeout)
+        db_size = os.path.getsize(raw_path)
+        sha256 = _compress(raw_path, gz_path)
+        # Снимок появляется под итоговым именем только целиком и после проверки
+        os.replace(gz_path, path)
+    finally:
+        for tmp in (raw_path, gz_path):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    removed = rotate_backups(backup_dir, keep)
+    result = {
+        "path": path,
+        "name": name,
+        "size": os.path.getsize(path),
+        "db_size": db_size,
+        "pages": page_count,
+        "restarts": restarts,
+        "sha256": sha256,
+        "duration": time.perf_counter() - started,
+        "removed": len(removed),
+    }
+    logger.info(
+        "Резервная копия %s: %d байт (база %d байт), %.2f с, удалено старых: %d",
+        path, result["size"], db_size, result["duration"], len(removed)
+    )
+    return result
+
+
+async def run_backup(**kwargs):
+    # Копирование идёт в отдельном потоке; sqlite3 отпускает GIL на каждом шаге
+    return await asyncio.to_thread(create_backup, **kwargs)
@@ -0,0 +1,120 @@
+"""
+Замер пикового RSS рассылок на большой базе:
+
+    python bench_fanout.py --rows 1000000
+
+Создаёт во временном каталоге базу с rows пользователями и rows сертификатами
+(сроки равномерно на ближайший год) и в отдельных процессах прогоняет рассылку
+дайджестов и broadcast с заглушкой вместо Bot API: потоковые версии
+(iter_digests, iter_all_user_ids) и для сравнения списочные (вся выборка
+iter_certificates_expiring_between в список, get_all_user_ids). Для каждого режима
+выводится прирост пикового RSS относительно процесса после импортов.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+MODES = ("notify_stream", "notify_list", "broadcast_stream", "broadcast_list")
+
+
+def build_database(rows, batch_size=50000):
+    from db import init_db
+
+    init_db()
+    conn = sqlite3.connect("certificates.db")
+    now = datetime.now().replace(microsecond=0)
+    for start in range(0, rows, batch_size):
+        ids = range(start, min(start + batch_size, rows))
+        conn.executemany("INSERT INTO users (telegram_id, language) VALUES (?, 'ua')", ((i + 1,) for i in ids))
+        conn.executemany(
+            "INSERT INTO certificates (telegram_id, organization, director, valid_from, valid_to, sha1) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (i + 1, f"Organization {i}", f"Director {i}", now.isoformat(),
+                 (now + timedelta(days=i % 365)).isoformat(), f"sha{i}")
+                for i in ids
+            )
+        )
+        conn.commit()
+    conn.close()
+
+
+class NullBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text):
+        self.sent += 1
+
+
+def peak_rss_kb():
+    # На Linux ru_maxrss в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def run_mode(mode):
+    import db
+    import notify
+
+    bot = NullBot()
+    if mode == "notify_stream":
+        await notify.notify_users(bot)
+    elif mode == "notify_list":
+        today = datetime.now().date()
+        rows = list(db.iter_certificates_expiring_between(today, today + timedelta(days=31)))
+        for row in rows:
+            await bot.send_message(chat_id=row[0], text=row[1])
+    elif mode == "broadcast_stream":
+        for uid in db.iter_all_user_ids():
+            await bot.send_message(chat_id=uid, text="ping")
+    elif mode == "broadcast_list":
+        for uid in db.get_all_user_ids():
+            await bot.send_message(chat_id=uid, text="ping")
+    return bot.sent
+
+
+def child(mode):
+    import db  # noqa: F401
+    import notify  # noqa: F401
+
+    baseline = peak_rss_kb()
+    started = time.perf_counter()
+    sent = asyncio.run(run_mode(mode))
+    elapsed = time.perf_counter() - started
+    print(f"{mode:<18}{sent:>10}{elapsed:>10.2f}{(peak_rss_kb() - baseline) / 1024:>14.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пиковый RSS рассылок на большой базе")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        os.chdir(args.workdir)
+        child(args.mode)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="certbot-bench-")
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(workdir)
+    started = time.perf_counter()
+    build_database(args.rows)
+    print(f"База {args.rows} строк создана за {time.perf_counter() - started:.1f} с: {workdir}")
+    print(f"{'режим':<18}{'сообщений':>10}{'сек':>10}{'+RSS, МБ':>14}")
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, os.path.join(here, "bench_fanout.py"), "--mode", mode, "--workdir", workdir],
+            check=True, env={**os.environ, "BOT_TOKEN": os.environ.get("BOT_TOKEN", "bench")},
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,48 @@
 import asyncio
-from notify import notify_users
+from notify import notify_users, notify_revoked
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, MessageHandler,
-    CallbackQueryHandler, ContextTypes, filters
+    CallbackQueryHandler, ContextTypes, TypeHandler, ApplicationHandlerStop, filters
+)
+from config import (
+    get_bot_token, ADMINS as ADMIN_IDS, DEFAULT_REMINDER_DAYS, MAX_REMINDER_DAYS, RATE_LIMITS,
+    USER_FLUSH_INTERVAL
 )
-from config import BOT_TOKEN, ADMINS as ADMIN_IDS
 from db import (
     init_db, insert_certificate, grant_access, revoke_access,
-    get_shared_with, has_view_access, get_certificates_for_user, get_certificates_shared_with,
-    get_user_language, set_user_language, get_all_user_ids, delete_expired_certificates
+    get_shared_with, has_view_access, iter_certificates_for_user, iter_certificates_shared_with,
+    set_user_language, iter_all_user_ids, delete_expired_certificates,
+    get_user_reminder_days, set_user_reminder_days, store_crl, refresh_revocation_status,
+    sync_list_cache
 )
 
-from cert_parser import parse_certificate
-from utils import extract_zip, is_certificate_file
+from cert_parser import parse_certificate, parse_crl, is_crl_file
+from export import build_export, EXPORT_FORMATS
+from utils import extract_zip, is_certificate_file, split_message
+from list_cache import certificate_list_cache
 from i18n import translations
+from log_setup import setup_logging, set_correlation_id
+from ratelimit import RateLimiter
+from leases import run_exclusive, lease_retry_delay
+from user_registry import user_registry, get_user_language
+from backup import run_backup
 import os
 
 def _(key, lang="ua"):
     from i18n import translations
     return translations.get(lang, translations["ua"]).get(key, key)
 
+import logging
 import tempfile
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
+
+logger = logging.getLogger(__name__)
 
-init_db()
+ADMIN_COMMANDS = {"backup_now", "broadcast", "cache_stats", "cleanup_expired", "notify_now", "ratelimit_stats"}
+
+rate_limiter = RateLimiter(RATE_LIMITS)
 
 async def language_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lang = get_user_language(update.effective_user.id)
@@ -75,16 +92,9 @@ def access_menu_keyboard(lang="ua"):
     ])
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    tg_lang = update.effective_user.language_code or "ua"
-    known_langs = ["ua", "ru", "en"]
-
-    # Всегда записываем пользователя в базу (INSERT OR IGNORE)
-    if tg_lang not in known_langs:
-        tg_lang = "ua"
-    set_user_language(user_id, tg_lang)
-
-    lang = get_user_language(user_id)
+    # Пользователь уже отмечен в user_registry (track_activity) и будет записан
+    # в базу ближайшим flush; язык из Telegram берётся только для новых
+    lang = get_user_language(update.effective_user.id)
     await update.message.reply_text(
         _(key="welcome", lang=lang),
         reply_markup=main_menu_keyboard(lang)
@@ -96,13 +106,12 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         document = update.message.document
         
-        print(f"DEBUG: Начинаем обработку документа {document.file_name} от пользователя {user_id}")
+        logger.info("Начинаем обработку документа %s от пользователя %s", document.file_name, user_id)
         
         try:
             lang = get_user_language(user_id)
-            print(f"DEBUG: Язык пользователя: {lang}")
         except Exception as e:
-            print(f"DEBUG: Ошибка получения языка пользователя: {e}")
+            logger.warning("Ошибка получения языка пользователя %s: %s", user_id, e)
             lang = "ua"  # Язык по умолчанию
 
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -110,28 +119,27 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             tg_file = await document.get_file()
             await tg_file.download_to_drive(file_path)
 
+            if is_crl_file(document.file_name):
+                await handle_crl_upload(update, file_path, lang)
+                return
+
             cert_paths = []
             if document.file_name.lower().endswith(".zip"):
-                print(f"DEBUG: Обрабатываем ZIP архив: {document.file_name}")
                 try:
                     extract_zip(file_path, tmpdir)
-                    print(f"DEBUG: ZIP архив распакован успешно")
                     
-                    for root, _, files in os.walk(tmpdir):
-                        print(f"DEBUG: Проверяем директорию {root}, найдено файлов: {len(files)}")
+                    for root, dirs, files in os.walk(tmpdir):
                         for name in files:
-                            print(f"DEBUG: Проверяем файл {name}")
                             if is_certificate_file(name):
                                 cert_paths.append(os.path.join(root, name))
-                                print(f"DEBUG: Найден сертификат: {name}")
+                                logger.debug("Найден сертификат в архиве: %s", name)
                     
-                    print(f"DEBUG: Всего найдено сертификатов: {len(cert_paths)}")
+                    logger.debug("ZIP архив %s распакован, сертификатов: %d", document.file_name, len(cert_paths))
                     if not cert_paths:
-                        print(f"DEBUG: Сертификаты не найдены, отправляем сообщение")
                         await update.message.reply_text(_(key="no_certs_in_archive", lang=lang))
                         return
                 except Exception as e:
-                    print(f"DEBUG: Ошибка при обработке ZIP: {e}")
+                    logger.warning("Ошибка при обработке ZIP %s: %s", document.file_name, e)
                     await update.message.reply_text(_(key="archive_error", lang=lang).format(error=e))
                     return
             elif is_certificate_file(document.file_name):
@@ -145,45 +153,36 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             errors = 0
             error_messages = []
             
-            print(f"DEBUG: Начинаем обработку {len(cert_paths)} сертификатов")
-            
             for cert_path in cert_paths:
                 filename = os.path.basename(cert_path)
-                print(f"DEBUG: Обрабатываем сертификат: {filename}")
                 try:
                     cert = parse_certificate(cert_path)
-                    print(f"DEBUG: Сертификат {filename} парсится успешно")
-                    print(f"DEBUG: Организация: {cert.get('organization', 'НЕТ')}")
-                    print(f"DEBUG: SHA1: {cert.get('sha1', 'НЕТ')}")
                     
                     # Проверяем, что сертификат содержит необходимые данные
                     if not cert.get("organization") or not cert.get("sha1"):
-                        print(f"DEBUG: {filename} содержит неполные данные")
+                        logger.debug("%s содержит неполные данные", filename)
                         error_messages.append(_(key="incomplete_cert_data", lang=lang).format(filename=filename))
                         errors += 1
                         continue
                         
-                    print(f"DEBUG: Пытаемся вставить сертификат {filename} в БД")
                     if insert_certificate(cert, user_id, filename):
-                        print(f"DEBUG: Сертификат {filename} добавлен успешно")
                         added += 1
                     else:
-                        print(f"DEBUG: Сертификат {filename} пропущен (дубликат)")
+                        logger.debug("Сертификат %s пропущен (дубликат)", filename)
                         skipped += 1
                 except Exception as e:
-                    print(f"DEBUG: Ошибка при обработке {filename}: {e}")
+                    logger.warning("Ошибка при обработке %s: %s", filename, e)
                     error_messages.append(f"⚠️ {filename}: {e}")
                     errors += 1
             
             # Отправляем результат
-            print(f"DEBUG: Итого - добавлено: {added}, пропущено: {skipped}, ошибок: {errors}")
+            logger.info("Итого - добавлено: %d, пропущено: %d, ошибок: %d", added, skipped, errors)
             
             if errors > 0:
                 result_message = _(key="upload_result_with_errors", lang=lang).format(added=added, skipped=skipped, errors=errors)
             else:
                 result_message = _(key="upload_result", lang=lang).format(added=added, skipped=skipped)
             
-            print(f"DEBUG: Отправляем результат: {result_message}")
             await update.message.reply_text(result_message)
             
             # Отправляем детали ошибок, если есть
@@ -191,90 +190,109 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 error_text = "\n".join(error_messages[:5])  # Показываем максимум 5 ошибок
                 if len(error_messages) > 5:
                     error_text += "\n" + _(key="more_errors", lang=lang).format(count=len(error_messages) - 5)
-                print(f"DEBUG: Отправляем детали ошибок: {error_text}")
                 await update.message.reply_text(error_text)
-            
-            print(f"DEBUG: Обработка документа завершена")
         
     except Exception as e:
-        print(f"DEBUG: КРИТИЧЕСКАЯ ОШИБКА в handle_document: {e}")
-        import traceback
-        print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        logger.exception("Критическая ошибка в handle_document: %s", e)
         try:
             await update.message.reply_text(f"❌ Произошла ошибка при обработке файла: {e}")
         except:
-            print("DEBUG: Не удалось отправить сообщение об ошибке пользователю")
+            logger.error("Не удалось отправить сообщение об ошибке пользователю %s", update.effective_user.id)
 
-async def certs_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def handle_crl_upload(update: Update, file_path, lang):
     user_id = update.effective_user.id
-    lang = get_user_language(user_id)
-    from db import get_certificates_for_user, get_certificates_shared_with
-
-    own = get_certificates_for_user(user_id)
-    shared = get_certificates_shared_with(user_id)
+    if user_id not in ADMIN_IDS:
+        await update.message.reply_text(_(key="no_admin_rights", lang=lang))
+        return
+    try:
+        crl = parse_crl(file_path)
+    except Exception as e:
+        logger.warning("Не удалось разобрать CRL %s: %s", file_path, e)
+        await update.message.reply_text(_(key="crl_parse_error", lang=lang).format(error=e))
+        return
 
-    if not own and not shared:
-        await update.message.reply_text(_(key="no_certificates", lang=lang))
+    # Индексация большого CRL не должна блокировать цикл событий
+    count = await asyncio.to_thread(store_crl, crl)
+    if count is None:
+        logger.info("CRL %s (№%s) не новее сохранённого, пропущен", crl["issuer"], crl["crl_number"])
+        await update.message.reply_text(_(key="crl_not_newer", lang=lang).format(issuer=crl["issuer"], number=crl["crl_number"]))
         return
 
-    lines = [_(key="your_certificates", lang=lang)]
-    idx = 1
+    revoked = await asyncio.to_thread(refresh_revocation_status)
+    logger.info("CRL %s (№%s) загружен: %d номеров, отозвано сертификатов: %d", crl["issuer"], crl["crl_number"], count, len(revoked))
+    await update.message.reply_text(_(key="crl_loaded", lang=lang).format(
+        issuer=crl["issuer"], number=crl["crl_number"], count=count, revoked=len(revoked)
+    ))
+    await notify_revoked(revoked, bot=update.get_bot())
 
-    if own:
-        lines.append("\n" + _(key="own_certificates", lang=lang))
-        for org, director, valid_to in own:
-            try:
-                dt = datetime.fromisoformat(valid_to)
-                valid_date = dt.strftime("%d.%m.%Y")
-            except:
-                valid_date = valid_to
-                dt = None
-
-            if dt:
-                today = datetime.today()
-                days_left = (dt.date() - today.date()).days
-                if days_left < 0:
-                    status = "🟥"
-                elif days_left < 7:
-                    status = "⚠️"
-                else:
-                    status = "✅"
-            else:
-                status = "❔"
+def format_cert_line(template_key, idx, org, director, valid_to, revoked_at, today, lang):
+    try:
+        dt = datetime.fromisoformat(valid_to)
+        valid_date = dt.strftime("%d.%m.%Y")
+    except:
+        valid_date = valid_to
+        dt = None
+
+    if revoked_at:
+        status = "⛔"
+    elif dt:
+        days_left = (dt.date() - today).days
+        if days_left < 0:
+            status = "🟥"
+        elif days_left < 7:
+            status = "⚠️"
+        else:
+            status = "✅"
+    else:
+        status = "❔"
 
-            lines.append(
-                _(key="cert_format", lang=lang).format(idx=idx, status=status, org=org, director=director, valid_date=valid_date)
-            )
+    return _(key=template_key, lang=lang).format(idx=idx, status=status, org=org, director=director, valid_date=valid_date)
+
+def iter_certificate_blocks(user_id, lang, today):
+    """Строки списка сертификатов по одной, прямо из курсоров базы."""
+    idx = 0
+    sections = (
+        ("own_certificates", "cert_format", iter_certificates_for_user(user_id)),
+        ("shared_certificates", "shared_cert_format", iter_certificates_shared_with(user_id)),
+    )
+    for header_key, template_key, rows in sections:
+        for n, (org, director, valid_to, revoked_at) in enumerate(rows):
+            if idx == 0:
+                yield _(key="your_certificates", lang=lang)
+            if n == 0:
+                yield "\n" + _(key=header_key, lang=lang)
             idx += 1
+            yield format_cert_line(template_key, idx, org, director, valid_to, revoked_at, today, lang)
 
-    if shared:
-        lines.append("\n" + _(key="shared_certificates", lang=lang))
-        for org, director, valid_to in shared:
-            try:
-                dt = datetime.fromisoformat(valid_to)
-                valid_date = dt.strftime("%d.%m.%Y")
-            except:
-                valid_date = valid_to
-                dt = None
-
-            if dt:
-                today = datetime.today()
-                days_left = (dt.date() - today.date()).days
-                if days_left < 0:
-                    status = "🟥"
-                elif days_left < 7:
-                    status = "⚠️"
-                else:
-                    status = "✅"
-            else:
-                status = "❔"
+def render_certificate_list(user_id, lang, today):
+    """Страницы списка собственных и доступных сертификатов, каждая в пределах лимита Telegram."""
+    return split_message(iter_certificate_blocks(user_id, lang, today)) or [_(key="no_certificates", lang=lang)]
 
-            lines.append(
-                _(key="shared_cert_format", lang=lang).format(idx=idx, status=status, org=org, director=director, valid_date=valid_date)
-            )
-            idx += 1
+async def certs_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    lang = get_user_language(user_id)
+    today = datetime.today().date()
+
+    # Записи других процессов (cron, реплики) видны только через счётчик в базе
+    sync_list_cache()
+    pages = certificate_list_cache.get(user_id, lang, today)
+    if pages is None:
+        pages = render_certificate_list(user_id, lang, today)
+        certificate_list_cache.put(user_id, lang, today, pages)
+
+    for page in pages:
+        await update.message.reply_text(page, parse_mode="Markdown")
 
-    await update.message.reply_text("\n\n".join(lines), parse_mode="Markdown")
+async def cache_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    lang = get_user_language(user_id)
+    if user_id not in ADMIN_IDS:
+        await update.message.reply_text(_(key="no_admin_rights", lang=lang))
+        return
+    await update.message.reply_text(
+        _(key="cache_stats", lang=lang).format(**certificate_list_cache.stats())
+        + "\n\n" + _(key="user_registry_stats", lang=lang).format(**user_registry.stats())
+    )
 
 
 async def handle_text_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -324,6 +342,68 @@ async def shared_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text(_(key="shared_with", lang=lang).format(users="\n".join(str(u) for u in viewers)))
 
+async def reminders_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    lang = get_user_language(user_id)
+    if not context.args:
+        days = get_user_reminder_days(user_id, default=DEFAULT_REMINDER_DAYS)
+        await update.message.reply_text(_(key="reminders_current", lang=lang).format(days=", ".join(map(str, days))))
+        return
+    try:
+        days = sorted({int(x) for x in context.args}, reverse=True)
+        if any(d < 0 or d > MAX_REMINDER_DAYS for d in days):
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(_(key="reminders_invalid", lang=lang).format(max_days=MAX_REMINDER_DAYS))
+        return
+    set_user_reminder_days(user_id, days)
+    await update.message.reply_text(_(key="reminders_set", lang=lang).format(days=", ".join(map(str, days))))
+
+def parse_export_args(args):
+    """Разбирает аргументы /export: [csv|xlsx] [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [owner=ID]."""
+    fmt = "csv"
+    filters = {}
+    for arg in args:
+        if arg.lower() in EXPORT_FORMATS:
+            fmt = arg.lower()
+            continue
+        key, sep, value = arg.partition("=")
+        if not sep:
+            raise ValueError(arg)
+        if key == "from":
+            filters["date_from"] = datetime.strptime(value, "%Y-%m-%d").date()
+        elif key == "to":
+            filters["date_to"] = datetime.strptime(value, "%Y-%m-%d").date()
+        elif key == "owner":
+            filters["owner_id"] = int(value)
+        else:
+            raise ValueError(arg)
+    return fmt, filters
+
+async def export_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    lang = get_user_language(user_id)
+    try:
+        fmt, filters = parse_export_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(_(key="export_usage", lang=lang))
+        return
+
+    owner_id = filters.get("owner_id")
+    if owner_id is not None and not has_view_access(owner_id, user_id):
+        await update.message.reply_text(_(key="export_no_access", lang=lang))
+        return
+
+    # Выгрузка может быть большой, поэтому формируем файл вне цикла событий
+    fileobj = await asyncio.to_thread(build_export, user_id, fmt, lang, **filters)
+    try:
+        filename = f"certificates_{datetime.now():%Y%m%d}.{fmt}"
+        await update.message.reply_document(
+            document=fileobj, filename=filename, caption=_(key="export_caption", lang=lang)
+        )
+    finally:
+        fileobj.close()
+
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -355,37 +435,190 @@ async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(_(key="no_admin_rights", lang=lang))
         return
 
-    message = " ".join(context.args)
+    args = list(context.args)
+    active_since = None
+    # /broadcast active=30 <текст> — только тем, кто заходил за последние 30 дней
+    if args and args[0].startswith("active="):
+        try:
+            days = int(args.pop(0).split("=", 1)[1])
+        except ValueError:
+            days = -1
+        if days < 1:
+            await update.message.reply_text(_(key="broadcast_usage", lang=lang))
+            return
+        active_since = datetime.utcnow() - timedelta(days=days)
+
+    message = " ".join(args)
     if not message:
         await update.message.reply_text(_(key="broadcast_usage", lang=lang))
         return
 
-    all_ids = get_all_user_ids()  # из базы
     count = 0
-    for uid in all_ids:
-        try:
-            await context.bot.send_message(chat_id=uid, text=message)
-            count += 1
-        except Exception:
-            pass  # например, если пользователь заблокировал бота
+    total = 0
+
+    async def send_all():
+        nonlocal count, total
+        # Идентификаторы читаются из базы пачками, без списка всех пользователей
+        for uid in iter_all_user_ids(active_since=active_since):
+            total += 1
+            try:
+                await context.bot.send_message(chat_id=uid, text=message)
+                count += 1
+            except Exception as e:
+                # например, если пользователь заблокировал бота
+                logger.debug("Рассылка: не удалось отправить %s: %s", uid, e)
+
+    # Одновременно идёт не более одной рассылки на все реплики
+    if not await run_exclusive("broadcast", send_all):
+        await update.message.reply_text(_(key="job_busy", lang=lang))
+        return
 
+    logger.info("Рассылка отправлена %d из %d пользователей", count, total)
     await update.message.reply_text(_(key="broadcast_sent", lang=lang).format(count=count))
 
 
-def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+async def backup_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    lang = get_user_language(user_id)
+    if user_id not in ADMIN_IDS:
+        await update.message.reply_text(_(key="no_admin_rights", lang=lang))
+        return
+
+    result = None
+
+    async def backup():
+        nonlocal result
+        result = await run_backup()
+
+    try:
+        # Та же аренда, что у ночного копирования, но без отметки дневного запуска
+        if not await run_exclusive("backup", backup):
+            await update.message.reply_text(_(key="job_busy", lang=lang))
+            return
+    except Exception:
+        logger.exception("Ошибка резервного копирования по команде администратора")
+        await update.message.reply_text(_(key="backup_failed", lang=lang))
+        return
+
+    await update.message.reply_text(_(key="backup_done", lang=lang).format(
+        name=result["name"],
+        size_kb=result["size"] / 1024,
+        db_size_kb=result["db_size"] / 1024,
+        duration=result["duration"],
+    ))
+
+
+async def track_activity(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Только отметка в памяти; в базу пишет периодический flush_user_activity_job
+    user = update.effective_user
+    if user is not None:
+        user_registry.touch(user.id, user.language_code)
+
+
+async def run_daily_exclusive(context: ContextTypes.DEFAULT_TYPE, name, job, run_key=None):
+    """
+    Ежедневная задача под арендой name с ключом запуска run_key (по умолчанию дата).
+    Если аренда занята, а запуск ещё не отмечен выполненным, повторяет попытку
+    после истечения аренды: так резервная реплика подхватывает задачу упавшего
+    лидера. Повторы идут, пока last_run_key аренды не станет равен run_key.
+    """
+    run_key = run_key or datetime.now().date().isoformat()
+    if await run_exclusive(name, job, run_key=run_key):
+        return
+    delay = await asyncio.to_thread(lease_retry_delay, name, run_key)
+    if delay is None:
+        return
+
+    async def retry(retry_context: ContextTypes.DEFAULT_TYPE):
+        await run_daily_exclusive(retry_context, name, job, run_key)
+
+    logger.info("Задача %s (%s) ещё не выполнена, повторная попытка через %.0f с", name, run_key, delay)
+    context.job_queue.run_once(retry, when=delay, name=f"{name}_retry")
+
+
+async def bind_correlation_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Все записи лога при обработке апдейта помечаются его update_id
+    set_correlation_id(update.update_id)
+
+
+def rate_limit_category(update: Update):
+    if update.callback_query:
+        return "command"
+    message = update.effective_message
+    if message is None:
+        return None
+    if message.document:
+        return "upload"
+    text = message.text or ""
+    if text.startswith("/"):
+        command = text[1:].split(maxsplit=1)[0].split("@")[0].lower() if len(text) > 1 else ""
+        if command in ADMIN_COMMANDS:
+            return "admin"
+    return "command"
+
+async def rate_limit_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    category = rate_limit_category(update)
+    if user is None or category is None:
+        return
+    retry_after = rate_limiter.check(user.id, category)
+    if not retry_after:
+        return
+
+    logger.info("Запрос пользователя %s (%s) отклонён лимитом, повтор через %.1f с", user.id, category, retry_after)
+    if rate_limiter.should_notify(user.id, category):
+        text = _(key="rate_limited", lang=get_user_language(user.id)).format(seconds=max(1, round(retry_after)))
+        if update.callback_query:
+            await update.callback_query.answer(text)
+        elif update.effective_message:
+            await update.effective_message.reply_text(text)
+    elif update.callback_query:
+        await update.callback_query.answer()
+    # Прерываем обработку апдейта остальными группами обработчиков
+    raise ApplicationHandlerStop
+
+async def ratelimit_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    lang = get_user_language(user_id)
+    if user_id not in ADMIN_IDS:
+        await update.message.reply_text(_(key="no_admin_rights", lang=lang))
+        return
+    stats = rate_limiter.stats()
+    lines = [_(key="ratelimit_stats", lang=lang).format(tracked=stats["tracked"], evicted=stats["evicted"])]
+    for category in RATE_LIMITS:
+        lines.append(f"• {category}: {stats['allowed'].get(category, 0)} / {stats['throttled'].get(category, 0)}")
+    await update.message.reply_text("\n".join(lines))
+
+
+def build_application(builder=None):
+    """
+    Собирает Application со всеми обработчиками и плановыми задачами.
+    builder позволяет подменить настройки, например адрес Bot API в нагрузочном тесте.
+    """
+    init_db()
+    builder = builder or ApplicationBuilder().token(get_bot_token())
+    app = builder.build()
+
+    app.add_handler(TypeHandler(Update, track_activity), group=-3)
+    app.add_handler(TypeHandler(Update, bind_correlation_id), group=-2)
+    app.add_handler(TypeHandler(Update, rate_limit_guard), group=-1)
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("certs", certs_cmd))
     app.add_handler(CommandHandler("share", share_cmd))
     app.add_handler(CommandHandler("unshare", unshare_cmd))
     app.add_handler(CommandHandler("shared", shared_cmd))
+    app.add_handler(CommandHandler("reminders", reminders_cmd))
+    app.add_handler(CommandHandler("export", export_cmd))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_button))
     app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
     app.add_handler(CommandHandler("language", language_cmd))
     app.add_handler(CallbackQueryHandler(handle_lang_choice, pattern="^lang_"))
     app.add_handler(CallbackQueryHandler(handle_callback))
     app.add_handler(CommandHandler("broadcast", broadcast))
+    app.add_handler(CommandHandler("ratelimit_stats", ratelimit_stats))
+    app.add_handler(CommandHandler("cache_stats", cache_stats))
+    app.add_handler(CommandHandler("backup_now", backup_now))
     
     async def cleanup_expired(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
@@ -393,7 +626,15 @@ def main():
         if user_id not in ADMIN_IDS:
             await update.message.reply_text(_(key="no_admin_rights", lang=lang))
             return
-        deleted = delete_expired_certificates()
+        deleted = 0
+
+        async def cleanup():
+            nonlocal deleted
+            deleted = await asyncio.to_thread(delete_expired_certificates)
+
+        if not await run_exclusive("cleanup", cleanup):
+            await update.message.reply_text(_(key="job_busy", lang=lang))
+            return
         await update.message.reply_text(_(key="cleanup_result", lang=lang).format(deleted=deleted))
 
     app.add_handler(CommandHandler("cleanup_expired", cleanup_expired))
@@ -405,22 +646,68 @@ def main():
             await update.message.reply_text(_(key="no_admin_rights", lang=lang))
             return
         await update.message.reply_text(_(key="notify_starting", lang=lang))
-        await notify_users()
+        # Та же аренда, что у ежедневной рассылки, но без отметки дневного запуска
+        if not await run_exclusive("daily_notify", lambda: notify_users(bot=context.bot)):
+            await update.message.reply_text(_(key="job_busy", lang=lang))
+            return
         await update.message.reply_text(_(key="notify_done", lang=lang))
 
     app.add_handler(CommandHandler("notify_now", notify_now))
 
     async def daily_notify_job(context: ContextTypes.DEFAULT_TYPE):
-        await notify_users()
+        await run_daily_exclusive(context, "daily_notify", lambda: notify_users(bot=context.bot))
+
+    async def revocation_check_job(context: ContextTypes.DEFAULT_TYPE):
+        async def check():
+            revoked = await asyncio.to_thread(refresh_revocation_status)
+            if revoked:
+                logger.info("Плановая проверка CRL: отозвано сертификатов: %d", len(revoked))
+                await notify_revoked(revoked, bot=context.bot)
+
+        await run_daily_exclusive(context, "revocation_check", check)
+
+    async def flush_user_activity_job(context: ContextTypes.DEFAULT_TYPE):
+        await asyncio.to_thread(user_registry.flush)
+
+    async def flush_user_activity_on_shutdown(application):
+        # Вызывается после остановки обработки апдейтов и job_queue
+        flushed = await asyncio.to_thread(user_registry.flush)
+        logger.info("При остановке записана активность %d пользователей", flushed)
+
+    app.post_shutdown = flush_user_activity_on_shutdown
+    app.job_queue.run_repeating(
+        flush_user_activity_job,
+        interval=USER_FLUSH_INTERVAL,
+        first=USER_FLUSH_INTERVAL,
+        name="flush_user_activity_job"
+    )
+
+    async def backup_job(context: ContextTypes.DEFAULT_TYPE):
+        await run_daily_exclusive(context, "backup", run_backup)
 
     local_tz = datetime.now().astimezone().tzinfo
+    app.job_queue.run_daily(
+        backup_job,
+        time=time(hour=3, minute=30, tzinfo=local_tz),
+        name="backup_job"
+    )
+    app.job_queue.run_daily(
+        revocation_check_job,
+        time=time(hour=7, minute=0, tzinfo=local_tz),
+        name="revocation_check_job"
+    )
     app.job_queue.run_daily(
         daily_notify_job,
         time=time(hour=7, minute=7, tzinfo=local_tz),
         name="daily_notify_job"
     )
 
-    app.run_polling()
+    return app
+
+
+def main():
+    setup_logging()
+    build_application().run_polling()
 
 if __name__ == "__main__":
     main()
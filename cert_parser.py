@@ -1,6 +1,9 @@
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
 
 def parse_certificate(filepath):
     with open(filepath, 'rb') as f:
@@ -8,10 +11,12 @@ def parse_certificate(filepath):
     try:
         cert = x509.load_der_x509_certificate(data, default_backend())
     except ValueError:
+        logger.debug("%s не в формате DER, пробуем PEM", filepath)
         cert = x509.load_pem_x509_certificate(data, default_backend())
 
     subject = {attr.oid._name: attr.value for attr in cert.subject}
     hash_sha1 = hashlib.sha1(cert.tbs_certificate_bytes).hexdigest()
+    logger.debug("Разобран сертификат %s: организация=%r sha1=%s", filepath, subject.get("organizationName"), hash_sha1)
     return {
         "organization": subject.get("organizationName", ""),
         "director": subject.get("commonName", ""),
@@ -21,5 +26,36 @@ def parse_certificate(filepath):
         "edrpou": subject.get("Unknown OID", "").replace("NTRUA-", ""),
         "valid_from": cert.not_valid_before,
         "valid_to": cert.not_valid_after,
-        "sha1": hash_sha1
+        "sha1": hash_sha1,
+        "serial": format(cert.serial_number, "X"),
+        "issuer": cert.issuer.rfc4514_string()
+    }
+
+def is_crl_file(filename):
+    return filename.lower().endswith('.crl')
+
+def parse_crl(filepath):
+    """
+    Разбирает список отозванных сертификатов (CRL) в формате DER или PEM.
+    Серийные номера в "revoked" отдаются генератором, чтобы не копировать большой список.
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    try:
+        crl = x509.load_der_x509_crl(data, default_backend())
+    except ValueError:
+        logger.debug("%s не в формате DER, пробуем PEM", filepath)
+        crl = x509.load_pem_x509_crl(data, default_backend())
+
+    try:
+        crl_number = crl.extensions.get_extension_for_class(x509.CRLNumber).value.crl_number
+    except x509.ExtensionNotFound:
+        crl_number = None
+
+    return {
+        "issuer": crl.issuer.rfc4514_string(),
+        "crl_number": crl_number,
+        "this_update": crl.last_update,
+        "next_update": crl.next_update,
+        "revoked": ((format(r.serial_number, "X"), r.revocation_date) for r in crl)
     }
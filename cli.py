@@ -0,0 +1,124 @@
+"""
+Точка входа для эксплуатации бота:
+
+    python cli.py run        запустить бота (long polling)
+    python cli.py notify     разослать дайджесты об истекающих сертификатах
+    python cli.py cleanup    удалить просроченные сертификаты
+    python cli.py migrate    создать или обновить схему базы
+    python cli.py stats      вывести сводку по базе
+    python cli.py backup     сделать сжатую резервную копию базы
+
+Каждая подкоманда импортирует только нужные ей модули: cleanup, migrate,
+stats и backup не загружают telegram и не требуют BOT_TOKEN. Время запуска
+(импорты и инициализация до начала работы) пишется в лог для каждой подкоманды.
+"""
+import time
+
+_started = time.perf_counter()
+
+import argparse
+import logging
+import sys
+
+from log_setup import setup_logging
+
+logger = logging.getLogger("cli")
+
+
+def _startup_done(command):
+    elapsed = (time.perf_counter() - _started) * 1000
+    logger.info("Подкоманда %s: запуск занял %.1f мс", command, elapsed)
+
+
+def cmd_run(args):
+    import bot
+    _startup_done("run")
+    bot.main()
+
+
+def cmd_notify(args):
+    import asyncio
+    from db import init_db
+    from notify import run_standalone
+    init_db()
+    _startup_done("notify")
+    asyncio.run(run_standalone())
+
+
+def cmd_cleanup(args):
+    import asyncio
+    from db import init_db, delete_expired_certificates
+    from leases import run_exclusive
+    init_db()
+    _startup_done("cleanup")
+    deleted = 0
+
+    async def cleanup():
+        nonlocal deleted
+        # В потоке, чтобы долгий DELETE не задерживал heartbeat аренды
+        deleted = await asyncio.to_thread(delete_expired_certificates)
+
+    # Очистка идемпотентна, поэтому повторные запуски разрешены; аренда лишь
+    # не даёт ей идти одновременно с /cleanup_expired или другим запуском
+    if not asyncio.run(run_exclusive("cleanup", cleanup)):
+        logger.warning("Очистка уже выполняется другим экземпляром, запуск пропущен")
+        sys.exit(1)
+    logger.info("Удалено просроченных сертификатов: %d", deleted)
+    print(deleted)
+
+
+def cmd_migrate(args):
+    from db import init_db
+    _startup_done("migrate")
+    init_db()
+    logger.info("Схема базы обновлена")
+
+
+def cmd_stats(args):
+    from db import init_db, get_stats
+    init_db()
+    _startup_done("stats")
+    for key, value in get_stats().items():
+        print(f"{key}: {value}")
+
+
+def cmd_backup(args):
+    import asyncio
+    from datetime import date
+    from backup import run_backup
+    from db import init_db
+    from leases import run_exclusive
+    init_db()
+    _startup_done("backup")
+    result = None
+
+    async def backup():
+        nonlocal result
+        result = await run_backup()
+
+    if asyncio.run(run_exclusive("backup", backup, run_key=date.today().isoformat())):
+        print(f"{result['path']} {result['size']} {result['duration']:.2f}")
+
+
+COMMANDS = {
+    "run": (cmd_run, "запустить бота"),
+    "notify": (cmd_notify, "разослать дайджесты об истекающих сертификатах"),
+    "cleanup": (cmd_cleanup, "удалить просроченные сертификаты"),
+    "migrate": (cmd_migrate, "создать или обновить схему базы"),
+    "stats": (cmd_stats, "вывести сводку по базе"),
+    "backup": (cmd_backup, "сделать сжатую резервную копию базы"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Управление ботом сертификатов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (func, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text).set_defaults(func=func)
+    args = parser.parse_args(argv)
+    setup_logging()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-# Токен Telegram-бота
+# Токен Telegram-бота. Проверяется лениво в get_bot_token(), чтобы команды,
+# которым не нужен Telegram (очистка, миграции, статистика), работали без него
 BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
 
-if not BOT_TOKEN:
-    # Явно предупреждаем при пустом токене, чтобы не было тихого фейла
-    raise RuntimeError("BOT_TOKEN не задан. Установите переменную окружения BOT_TOKEN.")
+def get_bot_token():
+    if not BOT_TOKEN:
+        # Явно предупреждаем при пустом токене, чтобы не было тихого фейла
+        raise RuntimeError("BOT_TOKEN не задан. Установите переменную окружения BOT_TOKEN.")
+    return BOT_TOKEN
 
 # ID администраторов (список int) через запятую: ADMIN_IDS=123,456
 admins_raw = os.getenv("ADMIN_IDS", "").strip()
@@ -19,3 +22,62 @@ if admins_raw:
         raise RuntimeError("ADMIN_IDS в .env должен содержать числа, разделённые запятыми.")
 else:
     ADMINS = []
+
+# Окна напоминаний по умолчанию (дней до истечения) через запятую: REMINDER_DAYS=30,7,0
+reminder_raw = os.getenv("REMINDER_DAYS", "30,7,0").strip()
+try:
+    DEFAULT_REMINDER_DAYS = sorted({int(x) for x in reminder_raw.split(",") if x.strip()}, reverse=True)
+except ValueError:
+    raise RuntimeError("REMINDER_DAYS в .env должен содержать числа, разделённые запятыми.")
+
+# Максимально допустимое окно напоминания в днях
+MAX_REMINDER_DAYS = 365
+
+def _parse_rate_limit(name, default):
+    # Формат "ёмкость/период в секундах", например RATE_LIMIT_UPLOAD=5/60
+    raw = os.getenv(name, default).strip()
+    try:
+        capacity, period = (float(x) for x in raw.split("/"))
+        if capacity < 1 or period <= 0:
+            raise ValueError
+    except ValueError:
+        raise RuntimeError(f"{name} в .env должен иметь вид <запросов>/<секунд>, например 10/60.")
+    return capacity, period
+
+# Лимиты запросов на пользователя по категориям
+RATE_LIMITS = {
+    "command": _parse_rate_limit("RATE_LIMIT_COMMAND", "20/60"),
+    "upload": _parse_rate_limit("RATE_LIMIT_UPLOAD", "5/60"),
+    "admin": _parse_rate_limit("RATE_LIMIT_ADMIN", "10/60"),
+}
+
+# Время жизни аренды плановых задач между репликами, секунд (продлевается каждые LEASE_TTL/3)
+try:
+    LEASE_TTL = float(os.getenv("LEASE_TTL", "60"))
+except ValueError:
+    raise RuntimeError("LEASE_TTL в .env должен быть числом секунд.")
+
+# Как часто накопленные регистрации и last_seen пользователей пишутся в базу, секунд
+try:
+    USER_FLUSH_INTERVAL = float(os.getenv("USER_FLUSH_INTERVAL", "10"))
+except ValueError:
+    raise RuntimeError("USER_FLUSH_INTERVAL в .env должен быть числом секунд.")
+
+# Резервные копии certificates.db: каталог, сколько последних снимков хранить,
+# страниц за шаг онлайн-копирования и пауза между шагами, секунд; после
+# BACKUP_MAX_RESTARTS перезапусков из-за записей копия снимается одним шагом,
+# а копирование дольше BACKUP_TIMEOUT секунд прерывается
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+try:
+    BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+    BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+    BACKUP_STEP_PAUSE = float(os.getenv("BACKUP_STEP_PAUSE", "0.005"))
+    BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))
+    BACKUP_TIMEOUT = float(os.getenv("BACKUP_TIMEOUT", "300"))
+except ValueError:
+    raise RuntimeError(
+        "BACKUP_KEEP, BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE, BACKUP_MAX_RESTARTS "
+        "и BACKUP_TIMEOUT в .env должны быть числами."
+    )
+if BACKUP_KEEP < 1 or BACKUP_PAGES_PER_STEP < 1:
+    raise RuntimeError("BACKUP_KEEP и BACKUP_PAGES_PER_STEP должны быть положительными.")
@@ -1,7 +1,13 @@
 
+import logging
 import sqlite3
+import time
 from datetime import datetime
 
+from list_cache import certificate_list_cache
+
+logger = logging.getLogger(__name__)
+
 def init_db():
     conn = sqlite3.connect("certificates.db")
     cursor = conn.cursor()
@@ -17,7 +23,10 @@ def init_db():
         valid_to TEXT,
         sha1 TEXT UNIQUE,
         filename TEXT,
-        uploaded_at TEXT
+        uploaded_at TEXT,
+        serial TEXT,
+        issuer TEXT,
+        revoked_at TEXT
     )
     ''')
     cursor.execute('''
@@ -30,12 +39,83 @@ def init_db():
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
         telegram_id INTEGER PRIMARY KEY,
-        language TEXT DEFAULT 'ua'
+        language TEXT DEFAULT 'ua',
+        reminder_days TEXT
+    )
+''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS crls (
+        issuer TEXT PRIMARY KEY,
+        crl_number INTEGER,
+        this_update TEXT,
+        next_update TEXT,
+        loaded_at TEXT
+    )
+''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS revoked_serials (
+        issuer TEXT NOT NULL,
+        serial TEXT NOT NULL,
+        revoked_at TEXT,
+        PRIMARY KEY (issuer, serial)
+    ) WITHOUT ROWID
+''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS job_leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT,
+        fencing_token INTEGER NOT NULL DEFAULT 0,
+        expires_at REAL NOT NULL DEFAULT 0,
+        last_run_key TEXT
+    )
+''')
+    # Счётчик изменений данных списков сертификатов: по нему кеш отрендеренных
+    # списков замечает записи из других процессов (cron, реплики)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS list_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
     )
 ''')
+    cursor.execute("INSERT OR IGNORE INTO list_version (id, version) VALUES (1, 0)")
+    # Миграции для баз, созданных до появления колонок
+    added = _add_missing_columns(cursor, "users", {"reminder_days": "TEXT", "last_seen": "TEXT"})
+    if "last_seen" in added:
+        # Активность до обновления неизвестна: считаем всех существующих пользователей
+        # заходившими в момент миграции, иначе /broadcast active=N их пропустит
+        cursor.execute("UPDATE users SET last_seen = ?", (datetime.utcnow().isoformat(timespec="seconds"),))
+    _add_missing_columns(cursor, "certificates", {"serial": "TEXT", "issuer": "TEXT", "revoked_at": "TEXT"})
+    # Индекс для диапазонной выборки сертификатов по сроку действия
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_certificates_valid_to ON certificates (valid_to)")
+    # Индекс для списков пользователя и обхода сертификатов по владельцу
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_certificates_owner_valid_to ON certificates (telegram_id, valid_to)")
     conn.commit()
     conn.close()
 
+def _bump_list_version(cursor):
+    # Вызывается в той же транзакции, что и изменение данных
+    cursor.execute("UPDATE list_version SET version = version + 1 WHERE id = 1 RETURNING version")
+    return cursor.fetchone()[0]
+
+def sync_list_cache():
+    """Сверяет кеш списков с базой перед чтением: чужие записи сбрасывают его целиком."""
+    conn = sqlite3.connect("certificates.db")
+    try:
+        version = conn.execute("SELECT version FROM list_version WHERE id = 1").fetchone()[0]
+    finally:
+        conn.close()
+    certificate_list_cache.sync(version)
+
+def _add_missing_columns(cursor, table, columns):
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    added = []
+    for name, decl in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            added.append(name)
+    return added
+
 def insert_certificate(cert, telegram_id, filename):
     conn = sqlite3.connect("certificates.db")
     cursor = conn.cursor()
@@ -45,12 +125,14 @@ def insert_certificate(cert, telegram_id, filename):
             "DELETE FROM certificates WHERE telegram_id = ? AND organization = ?",
             (telegram_id, cert["organization"])
         )
+        # Проверяем отзыв по загруженным CRL одним поиском по первичному ключу
+        revoked_at = _lookup_revocation(cursor, cert.get("issuer"), cert.get("serial"))
         # Теперь вставляем новый сертификат
         cursor.execute('''
         INSERT INTO certificates (
             telegram_id, organization, director, inn, edrpou, valid_from, valid_to,
-            sha1, filename, uploaded_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            sha1, filename, uploaded_at, serial, issuer, revoked_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             telegram_id,
             cert["organization"],
@@ -61,34 +143,136 @@ def insert_certificate(cert, telegram_id, filename):
             cert["valid_to"].isoformat(),
             cert["sha1"],
             filename,
-            datetime.utcnow().isoformat()
+            datetime.utcnow().isoformat(),
+            cert.get("serial"),
+            cert.get("issuer"),
+            revoked_at
         ))
+        version = _bump_list_version(cursor)
         conn.commit()
+        _invalidate_owner_lists(cursor, telegram_id)
+        certificate_list_cache.note_local_write(version)
         return True
     except sqlite3.IntegrityError as e:
         # Логируем детали ошибки для диагностики
-        print(f"IntegrityError при добавлении сертификата {filename}: {e}")
+        logger.debug("IntegrityError при добавлении сертификата %s: %s", filename, e)
         return False
     except Exception as e:
         # Логируем другие ошибки
-        print(f"Ошибка при добавлении сертификата {filename}: {e}")
+        logger.error("Ошибка при добавлении сертификата %s: %s", filename, e)
         return False
     finally:
         conn.close()
 
+def _invalidate_owner_lists(cursor, owner_id):
+    # Сертификаты владельца видны ему и всем, кому он открыл доступ
+    cursor.execute("SELECT viewer_id FROM shared_access WHERE owner_id = ?", (owner_id,))
+    certificate_list_cache.invalidate_users([owner_id] + [row[0] for row in cursor.fetchall()])
+
+def _lookup_revocation(cursor, issuer, serial):
+    if not issuer or not serial:
+        return None
+    cursor.execute("SELECT revoked_at FROM revoked_serials WHERE issuer = ? AND serial = ?", (issuer, serial))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def store_crl(crl, batch_size=1000):
+    """
+    Индексирует серийные номера из разобранного CRL (см. cert_parser.parse_crl).
+    Список издателя переиндексируется только если пришёл более новый CRL;
+    возвращает количество записанных номеров или None, если CRL не новее сохранённого.
+    """
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT crl_number, this_update FROM crls WHERE issuer = ?", (crl["issuer"],))
+        stored = cursor.fetchone()
+        this_update = crl["this_update"].isoformat()
+        if stored:
+            stored_number, stored_update = stored
+            if crl["crl_number"] is not None and stored_number is not None:
+                if crl["crl_number"] <= stored_number:
+                    return None
+            elif this_update <= stored_update:
+                return None
+
+        cursor.execute("DELETE FROM revoked_serials WHERE issuer = ?", (crl["issuer"],))
+        count = 0
+        batch = []
+        for serial, revoked_at in crl["revoked"]:
+            batch.append((crl["issuer"], serial, revoked_at.isoformat()))
+            if len(batch) >= batch_size:
+                cursor.executemany("INSERT OR REPLACE INTO revoked_serials (issuer, serial, revoked_at) VALUES (?, ?, ?)", batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany("INSERT OR REPLACE INTO revoked_serials (issuer, serial, revoked_at) VALUES (?, ?, ?)", batch)
+            count += len(batch)
+
+        cursor.execute('''
+            INSERT INTO crls (issuer, crl_number, this_update, next_update, loaded_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(issuer) DO UPDATE SET
+                crl_number = excluded.crl_number, this_update = excluded.this_update,
+                next_update = excluded.next_update, loaded_at = excluded.loaded_at
+        ''', (
+            crl["issuer"],
+            crl["crl_number"],
+            this_update,
+            crl["next_update"].isoformat() if crl["next_update"] else None,
+            datetime.utcnow().isoformat()
+        ))
+        conn.commit()
+        return count
+    finally:
+        conn.close()
+
+def refresh_revocation_status():
+    """
+    Пакетная проверка всех сертификатов по индексу отозванных номеров.
+    Возвращает впервые отозванные сертификаты: (telegram_id, organization, director, language).
+    """
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT c.id, c.telegram_id, c.organization, c.director, u.language, r.revoked_at
+        FROM certificates c
+        JOIN revoked_serials r ON r.issuer = c.issuer AND r.serial = c.serial
+        LEFT JOIN users u ON u.telegram_id = c.telegram_id
+        WHERE c.revoked_at IS NULL
+    ''')
+    newly_revoked = cursor.fetchall()
+    cursor.executemany(
+        "UPDATE certificates SET revoked_at = ? WHERE id = ?",
+        [(row[5], row[0]) for row in newly_revoked]
+    )
+    if newly_revoked:
+        version = _bump_list_version(cursor)
+    conn.commit()
+    conn.close()
+    if newly_revoked:
+        certificate_list_cache.invalidate_all()
+        certificate_list_cache.note_local_write(version)
+    return [(telegram_id, org, director, lang or "ua") for _, telegram_id, org, director, lang, _ in newly_revoked]
+
 def grant_access(owner_id, viewer_id):
     conn = sqlite3.connect("certificates.db")
     cursor = conn.cursor()
     cursor.execute("INSERT OR IGNORE INTO shared_access (owner_id, viewer_id) VALUES (?, ?)", (owner_id, viewer_id))
+    version = _bump_list_version(cursor)
     conn.commit()
     conn.close()
+    certificate_list_cache.invalidate_users([viewer_id])
+    certificate_list_cache.note_local_write(version)
 
 def revoke_access(owner_id, viewer_id):
     conn = sqlite3.connect("certificates.db")
     cursor = conn.cursor()
     cursor.execute("DELETE FROM shared_access WHERE owner_id = ? AND viewer_id = ?", (owner_id, viewer_id))
+    version = _bump_list_version(cursor)
     conn.commit()
     conn.close()
+    certificate_list_cache.invalidate_users([viewer_id])
+    certificate_list_cache.note_local_write(version)
 
 def get_shared_with(owner_id):
     conn = sqlite3.connect("certificates.db")
@@ -108,55 +292,205 @@ def has_view_access(owner_id, viewer_id):
     conn.close()
     return result is not None
 
-def get_certificates_for_user(user_id):
+def _iter_query(query, params=(), batch_size=500):
+    """Генератор строк запроса: курсор читается пачками по batch_size, без fetchall()."""
     conn = sqlite3.connect("certificates.db")
-    cursor = conn.cursor()
-    cursor.execute(
-    "SELECT organization, director, valid_to FROM certificates WHERE telegram_id = ? ORDER BY valid_to ASC",
-        (user_id,)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def iter_certificates_for_user(user_id, batch_size=500):
+    return _iter_query(
+        "SELECT organization, director, valid_to, revoked_at FROM certificates WHERE telegram_id = ? ORDER BY valid_to ASC",
+        (user_id,), batch_size
     )
-    result = cursor.fetchall()
-    conn.close()
-    return result
 
-def get_certificates_shared_with(user_id):
-    conn = sqlite3.connect("certificates.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT organization, director, valid_to
+def get_certificates_for_user(user_id):
+    return list(iter_certificates_for_user(user_id))
+
+def iter_certificates_shared_with(user_id, batch_size=500):
+    return _iter_query('''
+        SELECT organization, director, valid_to, revoked_at
         FROM certificates
         WHERE telegram_id IN (
             SELECT owner_id FROM shared_access WHERE viewer_id = ?
         )
-    ''', (user_id,))
-    result = cursor.fetchall()
-    conn.close()
-    return result
+    ''', (user_id,), batch_size)
+
+def get_certificates_shared_with(user_id):
+    return list(iter_certificates_shared_with(user_id))
 
+def iter_certificates_for_export(user_id, date_from=None, date_to=None, owner_id=None, batch_size=500):
+    """
+    Генератор собственных и доступных пользователю сертификатов для выгрузки.
+    Строки читаются курсором пачками по batch_size, без загрузки всей выборки.
+    date_from/date_to ограничивают valid_to (включительно), owner_id — владельца.
+    """
+    query = '''
+        SELECT telegram_id, organization, director, inn, edrpou, valid_from, valid_to, revoked_at
+        FROM certificates
+        WHERE (telegram_id = ? OR telegram_id IN (
+            SELECT owner_id FROM shared_access WHERE viewer_id = ?
+        ))
+    '''
+    params = [user_id, user_id]
+    if owner_id is not None:
+        query += " AND telegram_id = ?"
+        params.append(owner_id)
+    if date_from is not None:
+        query += " AND valid_to >= ?"
+        params.append(date_from.isoformat())
+    if date_to is not None:
+        # valid_to хранится с временем, поэтому сравниваем со следующим днём
+        query += " AND valid_to < DATE(?, '+1 day')"
+        params.append(date_to.isoformat())
+    query += " ORDER BY telegram_id, valid_to"
+    return _iter_query(query, params, batch_size)
 
-def get_user_language(user_id):
+def get_user_language(user_id, default="ua"):
     conn = sqlite3.connect("certificates.db")
     cursor = conn.cursor()
     cursor.execute("SELECT language FROM users WHERE telegram_id = ?", (user_id,))
     result = cursor.fetchone()
     conn.close()
-    return result[0] if result else "ua"
+    return result[0] if result else default
 
 def set_user_language(user_id, lang_code):
     conn = sqlite3.connect("certificates.db")
     cursor = conn.cursor()
     cursor.execute("INSERT INTO users (telegram_id, language) VALUES (?, ?) ON CONFLICT(telegram_id) DO UPDATE SET language = ?", (user_id, lang_code, lang_code))
+    version = _bump_list_version(cursor)
     conn.commit()
     conn.close()
+    certificate_list_cache.invalidate_users([user_id])
+    certificate_list_cache.note_local_write(version)
 
-def get_all_user_ids():
+def flush_user_activity(activity):
+    """
+    Записывает накопленную активность {telegram_id: (language, last_seen)} одной транзакцией.
+    Новые пользователи создаются с языком из Telegram; у существующих обновляется
+    только last_seen, выбранный пользователем язык не перезаписывается.
+    """
+    conn = sqlite3.connect("certificates.db")
+    try:
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO users (telegram_id, language, last_seen) VALUES (?, ?, ?)
+                ON CONFLICT(telegram_id) DO UPDATE
+                SET last_seen = MAX(COALESCE(last_seen, ''), excluded.last_seen)
+                """,
+                ((user_id, language, last_seen) for user_id, (language, last_seen) in activity.items())
+            )
+    finally:
+        conn.close()
+
+def parse_reminder_days(raw):
+    """Преобразует строку вида "30,7,0" в отсортированный по убыванию список дней."""
+    if not raw:
+        return []
+    return sorted({int(x) for x in raw.split(",") if x.strip()}, reverse=True)
+
+def get_user_reminder_days(user_id, default=None):
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT reminder_days FROM users WHERE telegram_id = ?", (user_id,))
+    result = cursor.fetchone()
+    conn.close()
+    if result and result[0]:
+        return parse_reminder_days(result[0])
+    return list(default or [])
+
+def set_user_reminder_days(user_id, days):
+    value = ",".join(str(d) for d in sorted(set(days), reverse=True))
     conn = sqlite3.connect("certificates.db")
     cursor = conn.cursor()
-    cursor.execute("SELECT telegram_id FROM users")
+    cursor.execute("INSERT INTO users (telegram_id, reminder_days) VALUES (?, ?) ON CONFLICT(telegram_id) DO UPDATE SET reminder_days = ?", (user_id, value, value))
+    conn.commit()
+    conn.close()
+
+def get_custom_reminder_days():
+    """Возвращает все различные пользовательские настройки окон напоминаний."""
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT reminder_days FROM users WHERE reminder_days IS NOT NULL AND reminder_days != ''")
     rows = cursor.fetchall()
     conn.close()
-    return [row[0] for row in rows]
+    return [parse_reminder_days(row[0]) for row in rows]
+
+def iter_certificates_expiring_between(date_from, date_to, batch_size=1000):
+    """
+    Диапазонная выборка по valid_to: сертификаты, срок которых истекает в
+    интервале [date_from, date_to), вместе с языком и окнами напоминаний владельца.
+    Строки упорядочены по владельцу, чтобы их можно было группировать на лету.
+
+    Выборка идёт пачками с keyset-пагинацией: каждая пачка — отдельный короткий
+    запрос, поэтому между пачками (пока идёт рассылка) база не держит блокировку
+    чтения, а память не зависит от числа строк. Индекс (telegram_id, valid_to)
+    задан явно: с ним каждая пачка продолжает обход с места остановки, а не
+    пересортировывает весь диапазон по valid_to.
+    """
+    conn = sqlite3.connect("certificates.db")
+    try:
+        cursor = conn.cursor()
+        last = (-2 ** 63, "", -1)
+        while True:
+            cursor.execute('''
+                SELECT c.id, c.telegram_id, c.organization, c.director, c.valid_to, c.revoked_at,
+                       u.language, u.reminder_days
+                FROM certificates c INDEXED BY idx_certificates_owner_valid_to
+                LEFT JOIN users u ON u.telegram_id = c.telegram_id
+                WHERE c.valid_to >= ? AND c.valid_to < ?
+                  AND (c.telegram_id, c.valid_to, c.id) > (?, ?, ?)
+                ORDER BY c.telegram_id, c.valid_to, c.id
+                LIMIT ?
+            ''', (date_from.isoformat(), date_to.isoformat(), *last, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                yield row[1:]
+            last = (rows[-1][1], rows[-1][4], rows[-1][0])
+            if len(rows) < batch_size:
+                break
+    finally:
+        conn.close()
+
+def iter_all_user_ids(batch_size=1000, active_since=None):
+    """
+    Идентификаторы всех пользователей пачками по первичному ключу (keyset-пагинация).
+    С active_since (datetime) — только заходившие в бота начиная с этого момента.
+    """
+    query = "SELECT telegram_id FROM users WHERE telegram_id > ?"
+    params = ()
+    if active_since is not None:
+        query += " AND last_seen >= ?"
+        params = (active_since.isoformat(),)
+    query += " ORDER BY telegram_id LIMIT ?"
+    conn = sqlite3.connect("certificates.db")
+    try:
+        cursor = conn.cursor()
+        last_id = -2 ** 63
+        while True:
+            cursor.execute(query, (last_id,) + params + (batch_size,))
+            rows = cursor.fetchall()
+            for (user_id,) in rows:
+                yield user_id
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
 
+def get_all_user_ids():
+    return list(iter_all_user_ids())
 
 
 def delete_expired_certificates():
@@ -169,7 +503,121 @@ def delete_expired_certificates():
         """
     )
     deleted = cursor.rowcount
+    if deleted:
+        version = _bump_list_version(cursor)
     conn.commit()
     conn.close()
+    if deleted:
+        certificate_list_cache.invalidate_all()
+        certificate_list_cache.note_local_write(version)
     return deleted
 
+def get_stats():
+    """Сводные счётчики по базе для команды статистики."""
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM users),
+            (SELECT COUNT(*) FROM certificates),
+            (SELECT COUNT(*) FROM certificates WHERE valid_to < DATE('now', 'localtime')),
+            (SELECT COUNT(*) FROM certificates
+                WHERE valid_to >= DATE('now', 'localtime') AND valid_to < DATE('now', 'localtime', '+31 days')),
+            (SELECT COUNT(*) FROM certificates WHERE revoked_at IS NOT NULL),
+            (SELECT COUNT(*) FROM shared_access),
+            (SELECT COUNT(*) FROM crls)
+    ''')
+    users, certificates, expired, expiring_30d, revoked, shares, crls = cursor.fetchone()
+    conn.close()
+    return {
+        "users": users,
+        "certificates": certificates,
+        "expired": expired,
+        "expiring_30d": expiring_30d,
+        "revoked": revoked,
+        "shares": shares,
+        "crls": crls,
+    }
+
+def acquire_lease(name, holder, ttl, run_key=None):
+    """
+    Пытается взять аренду задачи name на ttl секунд.
+    Возвращает fencing token (растёт при каждом захвате) или None, если
+    аренда ещё не истекла либо запуск run_key уже выполнен.
+    """
+    now = time.time()
+    conn = sqlite3.connect("certificates.db", isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        # BEGIN IMMEDIATE сразу берёт блокировку записи, чтобы реплики не гонялись
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT fencing_token, expires_at, last_run_key FROM job_leases WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        if row is None:
+            token = 1
+            cursor.execute(
+                "INSERT INTO job_leases (name, holder, fencing_token, expires_at) VALUES (?, ?, ?, ?)",
+                (name, holder, token, now + ttl)
+            )
+        else:
+            token, expires_at, last_run_key = row
+            # Живая аренда занята, даже если её держит этот же экземпляр
+            if expires_at > now or (run_key is not None and last_run_key == run_key):
+                cursor.execute("ROLLBACK")
+                return None
+            token += 1
+            cursor.execute(
+                "UPDATE job_leases SET holder = ?, fencing_token = ?, expires_at = ? WHERE name = ?",
+                (holder, token, now + ttl, name)
+            )
+        cursor.execute("COMMIT")
+        return token
+    except sqlite3.OperationalError as e:
+        # База занята другим экземпляром дольше таймаута — считаем аренду занятой
+        logger.warning("Не удалось взять аренду %s: %s", name, e)
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        return None
+    finally:
+        conn.close()
+
+def get_lease_state(name):
+    """(expires_at, last_run_key) аренды name или None, если её ещё ни разу не брали."""
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT expires_at, last_run_key FROM job_leases WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+def renew_lease(name, holder, token, ttl):
+    """Продлевает аренду (heartbeat); False, если её уже перехватил другой экземпляр."""
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE job_leases SET expires_at = ? WHERE name = ? AND holder = ? AND fencing_token = ? AND expires_at > ?",
+        (time.time() + ttl, name, holder, token, time.time())
+    )
+    renewed = cursor.rowcount == 1
+    conn.commit()
+    conn.close()
+    return renewed
+
+def release_lease(name, holder, token, run_key=None):
+    """Освобождает аренду; при переданном run_key отмечает запуск выполненным."""
+    conn = sqlite3.connect("certificates.db")
+    cursor = conn.cursor()
+    if run_key is not None:
+        cursor.execute(
+            "UPDATE job_leases SET expires_at = 0, last_run_key = ? WHERE name = ? AND holder = ? AND fencing_token = ?",
+            (run_key, name, holder, token)
+        )
+    else:
+        cursor.execute(
+            "UPDATE job_leases SET expires_at = 0 WHERE name = ? AND holder = ? AND fencing_token = ?",
+            (name, holder, token)
+        )
+    released = cursor.rowcount == 1
+    conn.commit()
+    conn.close()
+    return released
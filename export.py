@@ -0,0 +1,110 @@
+import csv
+import io
+import tempfile
+from datetime import datetime
+
+from db import iter_certificates_for_export
+from i18n import translations
+
+# Файлы меньше этого размера остаются в памяти, большие сбрасываются на диск
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+EXPORT_COLUMNS = [
+    "col_owner", "col_organization", "col_director", "col_inn", "col_edrpou",
+    "col_valid_from", "col_valid_to", "col_status",
+]
+
+# Excel и другие табличные редакторы считают формулой ячейку с таким началом
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _(key, lang="ua"):
+    return translations.get(lang, translations["ua"]).get(key, key)
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value).date()
+    except (TypeError, ValueError):
+        return None
+
+def _status(valid_to, revoked_at, today):
+    if revoked_at:
+        return "status_revoked"
+    if valid_to is None:
+        return "status_unknown"
+    days_left = (valid_to - today).days
+    if days_left < 0:
+        return "status_expired"
+    elif days_left < 7:
+        return "status_expiring"
+    return "status_valid"
+
+def iter_export_rows(user_id, lang="ua", **filters):
+    """Строки выгрузки: владелец, организация, директор, ИНН, ЕДРПОУ, даты и статус."""
+    today = datetime.today().date()
+    for owner_id, org, director, inn, edrpou, valid_from, valid_to, revoked_at in iter_certificates_for_export(user_id, **filters):
+        date_from = _parse_date(valid_from)
+        date_to = _parse_date(valid_to)
+        yield (
+            owner_id, org, director, inn, edrpou,
+            date_from or valid_from, date_to or valid_to,
+            _(key=_status(date_to, revoked_at, today), lang=lang),
+        )
+
+def escape_cell(value):
+    """
+    Организация и директор берутся из субъекта загруженного сертификата, то есть
+    задаются пользователем: текст, похожий на формулу, экранируем апострофом.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def write_csv(rows, header, fileobj):
+    # utf-8-sig, чтобы Excel корректно открывал кириллицу
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text, delimiter=";")
+    writer.writerow(header)
+    writer.writerows([escape_cell(value) for value in row] for row in rows)
+    text.flush()
+    text.detach()
+
+def write_xlsx(rows, header, fileobj):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    def text_cell(value):
+        # Явный строковый тип: openpyxl не превратит значение в формулу
+        cell = WriteOnlyCell(ws, value=escape_cell(value))
+        cell.data_type = "s"
+        return cell
+
+    # write_only режим пишет строки потоком, не держа лист в памяти
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(header)
+    for row in rows:
+        ws.append([text_cell(value) if isinstance(value, str) else value for value in row])
+    wb.save(fileobj)
+
+def build_export(user_id, fmt="csv", lang="ua", **filters):
+    """
+    Пишет собственные и доступные пользователю сертификаты в SpooledTemporaryFile.
+    Строки читаются из базы пачками, поэтому память не зависит от их количества.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат выгрузки: {fmt}")
+    header = [_(key=col, lang=lang) for col in EXPORT_COLUMNS]
+    rows = iter_export_rows(user_id, lang=lang, **filters)
+    fileobj = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+    try:
+        if fmt == "csv":
+            write_csv(rows, header, fileobj)
+        else:
+            write_xlsx(rows, header, fileobj)
+    except Exception:
+        fileobj.close()
+        raise
+    fileobj.seek(0)
+    return fileobj
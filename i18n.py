@@ -46,11 +46,46 @@ translations = {
         'access_open_for': '🔐 Доступ открыт для:',
         'unknown_command': '⚠️ Неизвестная команда.',
         'no_admin_rights': '⛔ У вас нет прав на эту команду.',
-        'broadcast_usage': '❗ Используйте: /broadcast <текст>',
+        'broadcast_usage': '❗ Используйте: /broadcast [active=<дней>] <текст>',
         'broadcast_sent': '✅ Сообщение отправлено {count} пользователям.',
         'cleanup_result': '🧹 Удалено просроченных сертификатов: {deleted}',
         'notify_starting': '⏳ Запускаю проверку и рассылку уведомлений...',
-        'notify_done': '✅ Готово.'
+        'notify_done': '✅ Готово.',
+        'digest_header': '🔔 Сертификаты с истекающим сроком действия: {count}',
+        'digest_item': '🏢 {org}\n👤 {director}\n⏳ Через {days} дн., до {valid_date}',
+        'digest_item_today': '⚠️ 🏢 {org}\n👤 {director}\n⏳ Истекает сегодня, {valid_date}',
+        'reminders_current': '🔔 Напоминания приходят за {days} дн. до истечения срока.\nИзменить: /reminders 30 7 1 0',
+        'reminders_set': '✅ Напоминания будут приходить за {days} дн. до истечения срока.',
+        'reminders_invalid': '❌ Укажите числа от 0 до {max_days}, например: /reminders 30 7 0',
+        'export_usage': '❗ Использование: /export [csv|xlsx] [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [owner=user_id]',
+        'export_no_access': '⛔ У вас нет доступа к сертификатам этого пользователя.',
+        'export_caption': '📊 Выгрузка сертификатов',
+        'col_owner': 'Владелец',
+        'col_organization': 'Организация',
+        'col_director': 'Директор',
+        'col_inn': 'ИНН',
+        'col_edrpou': 'ЕДРПОУ',
+        'col_valid_from': 'Действует с',
+        'col_valid_to': 'Действует до',
+        'col_status': 'Статус',
+        'status_valid': 'Действителен',
+        'status_expiring': 'Истекает',
+        'status_expired': 'Просрочен',
+        'status_unknown': 'Неизвестно',
+        'rate_limited': '⏳ Слишком много запросов. Пожалуйста, повторите через {seconds} с.',
+        'ratelimit_stats': '🚦 Лимиты запросов (отслеживается: {tracked}, вытеснено: {evicted})\nкатегория: разрешено / отклонено',
+        'status_revoked': 'Отозван',
+        'revoked_mark': '⛔ Сертификат отозван',
+        'revoked_header': '⛔ Сертификаты отозваны издателем:',
+        'revoked_item': '🏢 {org}\n👤 {director}',
+        'crl_parse_error': '❌ Не удалось разобрать CRL: {error}',
+        'crl_not_newer': 'ℹ️ CRL {issuer} (№{number}) не новее уже загруженного, пропущен.',
+        'crl_loaded': '✅ CRL {issuer} (№{number}) загружен: отозванных номеров {count}, найдено отозванных сертификатов {revoked}.',
+        'job_busy': '⏳ Эта задача уже выполняется другим экземпляром бота.',
+        'backup_done': '💾 Резервная копия {name}\nРазмер: {size_kb:.1f} КБ (база {db_size_kb:.1f} КБ)\nВремя: {duration:.2f} с',
+        'backup_failed': '❌ Не удалось создать резервную копию, подробности в логе.',
+        'user_registry_stats': '👤 Буфер активности пользователей\nОжидают записи: {pending}\nЗаписей в базу: {flushes}, пользователей записано: {flushed_users}',
+        'cache_stats': '🗃 Кеш списков сертификатов\nЗаписей: {entries}\nПопаданий: {hits}, промахов: {misses} ({hit_ratio:.1%})\nВытеснено: {evictions}, сброшено: {invalidations}\nСбросов из-за записей других процессов: {external_resets}'
     },
     'ua': {
         'welcome': '👋 Вітаю! Я бот для контролю строків дії сертифікатів.',
@@ -99,11 +134,46 @@ translations = {
         'access_open_for': '🔐 Доступ відкрито для:',
         'unknown_command': '⚠️ Невідома команда.',
         'no_admin_rights': '⛔ У вас немає прав на цю команду.',
-        'broadcast_usage': '❗ Використовуйте: /broadcast <текст>',
+        'broadcast_usage': '❗ Використовуйте: /broadcast [active=<днів>] <текст>',
         'broadcast_sent': '✅ Повідомлення відправлено {count} користувачам.',
         'cleanup_result': '🧹 Видалено прострочених сертифікатів: {deleted}',
         'notify_starting': '⏳ Запускаю перевірку та розсилку сповіщень...',
-        'notify_done': '✅ Готово.'
+        'notify_done': '✅ Готово.',
+        'digest_header': '🔔 Сертифікати, строк дії яких спливає: {count}',
+        'digest_item': '🏢 {org}\n👤 {director}\n⏳ Через {days} дн., до {valid_date}',
+        'digest_item_today': '⚠️ 🏢 {org}\n👤 {director}\n⏳ Спливає сьогодні, {valid_date}',
+        'reminders_current': '🔔 Нагадування надходять за {days} дн. до закінчення строку.\nЗмінити: /reminders 30 7 1 0',
+        'reminders_set': '✅ Нагадування надходитимуть за {days} дн. до закінчення строку.',
+        'reminders_invalid': '❌ Вкажіть числа від 0 до {max_days}, наприклад: /reminders 30 7 0',
+        'export_usage': '❗ Використання: /export [csv|xlsx] [from=РРРР-ММ-ДД] [to=РРРР-ММ-ДД] [owner=user_id]',
+        'export_no_access': '⛔ У вас немає доступу до сертифікатів цього користувача.',
+        'export_caption': '📊 Вивантаження сертифікатів',
+        'col_owner': 'Власник',
+        'col_organization': 'Організація',
+        'col_director': 'Директор',
+        'col_inn': 'ІПН',
+        'col_edrpou': 'ЄДРПОУ',
+        'col_valid_from': 'Діє з',
+        'col_valid_to': 'Діє до',
+        'col_status': 'Статус',
+        'status_valid': 'Дійсний',
+        'status_expiring': 'Спливає',
+        'status_expired': 'Прострочений',
+        'status_unknown': 'Невідомо',
+        'rate_limited': '⏳ Забагато запитів. Будь ласка, повторіть через {seconds} с.',
+        'ratelimit_stats': '🚦 Ліміти запитів (відстежується: {tracked}, витіснено: {evicted})\nкатегорія: дозволено / відхилено',
+        'status_revoked': 'Відкликаний',
+        'revoked_mark': '⛔ Сертифікат відкликано',
+        'revoked_header': '⛔ Сертифікати відкликано видавцем:',
+        'revoked_item': '🏢 {org}\n👤 {director}',
+        'crl_parse_error': '❌ Не вдалося розібрати CRL: {error}',
+        'crl_not_newer': 'ℹ️ CRL {issuer} (№{number}) не новіший за вже завантажений, пропущено.',
+        'crl_loaded': '✅ CRL {issuer} (№{number}) завантажено: відкликаних номерів {count}, знайдено відкликаних сертифікатів {revoked}.',
+        'job_busy': '⏳ Це завдання вже виконується іншим екземпляром бота.',
+        'backup_done': '💾 Резервна копія {name}\nРозмір: {size_kb:.1f} КБ (база {db_size_kb:.1f} КБ)\nЧас: {duration:.2f} с',
+        'backup_failed': '❌ Не вдалося створити резервну копію, подробиці в лозі.',
+        'user_registry_stats': '👤 Буфер активності користувачів\nОчікують запису: {pending}\nЗаписів у базу: {flushes}, користувачів записано: {flushed_users}',
+        'cache_stats': '🗃 Кеш списків сертифікатів\nЗаписів: {entries}\nВлучань: {hits}, промахів: {misses} ({hit_ratio:.1%})\nВитіснено: {evictions}, скинуто: {invalidations}\nСкидань через записи інших процесів: {external_resets}'
     },
     'en': {
         'welcome': "👋 Hello! I'm a bot for tracking certificate expiration dates.",
@@ -152,10 +222,45 @@ translations = {
         'access_open_for': '🔐 Access is open for:',
         'unknown_command': '⚠️ Unknown command.',
         'no_admin_rights': '⛔ You do not have rights to this command.',
-        'broadcast_usage': '❗ Use: /broadcast <text>',
+        'broadcast_usage': '❗ Use: /broadcast [active=<days>] <text>',
         'broadcast_sent': '✅ Message sent to {count} users.',
         'cleanup_result': '🧹 Deleted expired certificates: {deleted}',
         'notify_starting': '⏳ Starting check and notification sending...',
-        'notify_done': '✅ Done.'
+        'notify_done': '✅ Done.',
+        'digest_header': '🔔 Certificates expiring soon: {count}',
+        'digest_item': '🏢 {org}\n👤 {director}\n⏳ In {days} days, until {valid_date}',
+        'digest_item_today': '⚠️ 🏢 {org}\n👤 {director}\n⏳ Expires today, {valid_date}',
+        'reminders_current': '🔔 Reminders are sent {days} days before expiration.\nChange: /reminders 30 7 1 0',
+        'reminders_set': '✅ Reminders will be sent {days} days before expiration.',
+        'reminders_invalid': '❌ Specify numbers from 0 to {max_days}, e.g.: /reminders 30 7 0',
+        'export_usage': '❗ Usage: /export [csv|xlsx] [from=YYYY-MM-DD] [to=YYYY-MM-DD] [owner=user_id]',
+        'export_no_access': "⛔ You do not have access to this user's certificates.",
+        'export_caption': '📊 Certificate export',
+        'col_owner': 'Owner',
+        'col_organization': 'Organization',
+        'col_director': 'Director',
+        'col_inn': 'INN',
+        'col_edrpou': 'EDRPOU',
+        'col_valid_from': 'Valid from',
+        'col_valid_to': 'Valid to',
+        'col_status': 'Status',
+        'status_valid': 'Valid',
+        'status_expiring': 'Expiring',
+        'status_expired': 'Expired',
+        'status_unknown': 'Unknown',
+        'rate_limited': '⏳ Too many requests. Please try again in {seconds} s.',
+        'ratelimit_stats': '🚦 Rate limits (tracked: {tracked}, evicted: {evicted})\ncategory: allowed / throttled',
+        'status_revoked': 'Revoked',
+        'revoked_mark': '⛔ Certificate revoked',
+        'revoked_header': '⛔ Certificates revoked by the issuer:',
+        'revoked_item': '🏢 {org}\n👤 {director}',
+        'crl_parse_error': '❌ Failed to parse CRL: {error}',
+        'crl_not_newer': 'ℹ️ CRL {issuer} (#{number}) is not newer than the loaded one, skipped.',
+        'crl_loaded': '✅ CRL {issuer} (#{number}) loaded: {count} revoked serials, {revoked} revoked certificates found.',
+        'job_busy': '⏳ This job is already running on another bot instance.',
+        'backup_done': '💾 Backup {name}\nSize: {size_kb:.1f} KB (database {db_size_kb:.1f} KB)\nTime: {duration:.2f} s',
+        'backup_failed': '❌ Backup failed, see the log for details.',
+        'user_registry_stats': '👤 User activity buffer\nPending: {pending}\nFlushes: {flushes}, users written: {flushed_users}',
+        'cache_stats': '🗃 Certificate list cache\nEntries: {entries}\nHits: {hits}, misses: {misses} ({hit_ratio:.1%})\nEvicted: {evictions}, invalidated: {invalidations}\nResets after writes by other processes: {external_resets}'
     }
 }
\ No newline at end of file
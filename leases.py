@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from config import LEASE_TTL
+from db import acquire_lease, renew_lease, release_lease, get_lease_state
+
+logger = logging.getLogger(__name__)
+
+# Уникальный идентификатор этого экземпляра бота среди реплик
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseLost(Exception):
+    pass
+
+
+async def run_exclusive(name, job, run_key=None, ttl=LEASE_TTL):
+    """
+    Выполняет корутину job() только на одном экземпляре: берёт аренду name в базе,
+    продлевает её heartbeat'ом каждые ttl/3 секунд и отменяет job при потере аренды.
+    С run_key (например, дата) запуск выполняется не более одного раза на ключ.
+    Возвращает True, если job выполнен этим экземпляром; остальные остаются в резерве.
+    """
+    token = await asyncio.to_thread(acquire_lease, name, INSTANCE_ID, ttl, run_key)
+    if token is None:
+        logger.info("Задача %s (%s) выполняется другим экземпляром, пропускаем", name, run_key)
+        return False
+
+    logger.info("Аренда %s получена, fencing token %d", name, token)
+    job_task = asyncio.ensure_future(job())
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(ttl / 3)
+            if not await asyncio.to_thread(renew_lease, name, INSTANCE_ID, token, ttl):
+                logger.error("Аренда %s (token %d) потеряна, останавливаем задачу", name, token)
+                job_task.cancel()
+                return
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        await job_task
+    except asyncio.CancelledError:
+        if heartbeat_task.done():
+            raise LeaseLost(name)
+        raise
+    except Exception:
+        # Задача упала: освобождаем аренду, не отмечая запуск выполненным
+        await asyncio.to_thread(release_lease, name, INSTANCE_ID, token)
+        raise
+    finally:
+        heartbeat_task.cancel()
+
+    # Запуск считается выполненным, только если fencing token всё ещё наш
+    if not await asyncio.to_thread(release_lease, name, INSTANCE_ID, token, run_key):
+        raise LeaseLost(name)
+    return True
+
+
+def lease_retry_delay(name, run_key, margin=1.0):
+    """
+    Через сколько секунд повторить неудавшийся захват аренды name для запуска run_key.
+    None — запуск уже отмечен выполненным; иначе время до истечения текущей аренды
+    (лидер мог упасть посреди задачи, не освободив её) плюс margin.
+    """
+    state = get_lease_state(name)
+    if state is None:
+        return margin
+    expires_at, last_run_key = state
+    if last_run_key == run_key:
+        return None
+    return max(expires_at - time.time(), 0) + margin
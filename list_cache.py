@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+
+# Максимум закешированных списков (ключ: пользователь, язык, локальная дата)
+CERT_LIST_CACHE_SIZE = 1000
+
+
+class RenderCache:
+    """
+    LRU-кеш отрендеренных страниц списка сертификатов с ключом (user_id, lang, date).
+    Записи сбрасываются явно при изменении данных (см. вызовы invalidate_* в db.py);
+    смена даты меняет ключ, поэтому статусы «истекает/просрочен» не устаревают.
+    Инвалидация может приходить из потоков asyncio.to_thread, поэтому нужен lock.
+
+    Записи других процессов (cli.py cleanup из cron, другие реплики) сюда не доходят,
+    поэтому каждая запись увеличивает счётчик list_version в базе, а перед чтением
+    кеша sync() сверяет его с последней известной версией и при расхождении
+    сбрасывает кеш целиком. Свои записи учитываются через note_local_write().
+    """
+
+    def __init__(self, max_entries=CERT_LIST_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.version = None
+        self.external_resets = 0
+
+    def get(self, user_id, lang, day):
+        key = (user_id, lang, day)
+        with self.lock:
+            pages = self.entries.get(key)
+            if pages is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return pages
+
+    def put(self, user_id, lang, day, pages):
+        key = (user_id, lang, day)
+        with self.lock:
+            self.entries[key] = pages
+            self.entries.move_to_end(key)
+            self.keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                old_key, _ = self.entries.popitem(last=False)
+                self._forget(old_key)
+                self.evictions += 1
+
+    def invalidate_users(self, user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                for key in self.keys_by_user.pop(user_id, ()):
+                    del self.entries[key]
+                    self.invalidations += 1
+
+    def invalidate_all(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+    def sync(self, version):
+        with self.lock:
+            if version == self.version:
+                return
+            if self.version is not None:
+                self.external_resets += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.keys_by_user.clear()
+            self.version = version
+
+    def note_local_write(self, version):
+        # Своя запись уже сбросила нужные записи адресно; если между версиями
+        # вклинилась чужая запись, версия не сдвигается и sync() сбросит всё
+        with self.lock:
+            if self.version is not None and version == self.version + 1:
+                self.version = version
+
+    def _forget(self, key):
+        keys = self.keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_user[key[0]]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "external_resets": self.external_resets,
+            }
+
+
+certificate_list_cache = RenderCache()
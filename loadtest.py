@@ -0,0 +1,437 @@
+"""
+Нагрузочный тест бота против локальной подмены Telegram Bot API.
+
+    python loadtest.py --users 1000 --certs-per-zip 3 --concurrent-updates 8
+
+Поднимает HTTP-сервер, отвечающий на getUpdates, sendMessage, editMessageText,
+answerCallbackQuery, getFile, sendDocument и отдающий файлы, и собирает
+настоящее Application через bot.build_application с адресом этого сервера.
+Каждый симулированный пользователь проходит сценарий: /start, загрузка ZIP с
+сертификатами, /certs, /share, /language и выбор языка, повторный /certs,
+/unshare. После сессий администратор запускает /notify_now.
+
+Задержка шага — время от появления апдейта в getUpdates до первого ответа бота
+в чат пользователя. Для каждого шага выводятся пропускная способность и
+p50/p95/p99. Сервер и симуляция работают в отдельном потоке со своим циклом
+событий, чтобы блокирующие обработчики бота не искажали отметки времени.
+База создаётся во временном каталоге.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.parse
+import zipfile
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from email.policy import HTTP
+from itertools import islice
+
+from log_setup import setup_logging
+
+logger = logging.getLogger("loadtest")
+
+TOKEN = "123456:LOADTEST"
+ADMIN_ID = 1
+FIRST_USER_ID = 10_000_000
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+
+
+def generate_archives(user_ids, certs_per_zip):
+    """ZIP-архивы с уникальными сертификатами для каждого пользователя: {file_id: bytes}."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    issuer = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "LoadTest CA")])
+    now = datetime.utcnow()
+    rnd = random.Random(0)
+    archives = {}
+    for uid in user_ids:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            for k in range(certs_per_zip):
+                subject = x509.Name([
+                    x509.NameAttribute(NameOID.ORGANIZATION_NAME, f"LoadTest {uid}-{k}"),
+                    x509.NameAttribute(NameOID.COMMON_NAME, f"Director {uid}-{k}"),
+                    x509.NameAttribute(NameOID.SERIAL_NUMBER, f"TINUA-{uid}{k}"),
+                ])
+                cert = (
+                    x509.CertificateBuilder()
+                    .subject_name(subject)
+                    .issuer_name(issuer)
+                    .public_key(key.public_key())
+                    .serial_number(uid * 1000 + k)
+                    .not_valid_before(now - timedelta(days=1))
+                    .not_valid_after(now + timedelta(days=rnd.choice([0, 3, 7, 30, 90, 365])))
+                    .sign(key, hashes.SHA256())
+                )
+                zf.writestr(f"{uid}_{k}.cer", cert.public_bytes(serialization.Encoding.DER))
+        archives[f"zip{uid}"] = buf.getvalue()
+    return archives
+
+
+def percentile(sorted_values, p):
+    # Метод ближайшего ранга
+    if not sorted_values:
+        return float("nan")
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+class Waiter:
+    __slots__ = ("future", "expected", "messages")
+
+    def __init__(self, future, expected):
+        self.future = future
+        self.expected = expected
+        self.messages = []
+
+
+class FakeBotApi:
+    """Минимальная подмена Bot API на asyncio-сокетах, работает в собственном потоке."""
+
+    def __init__(self, files):
+        self.files = files
+        self.pending = deque()
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.waiters = {}
+        self.calls = Counter()
+        self.latencies = defaultdict(list)
+        self.timeouts = Counter()
+        self.loop = None
+        self.server = None
+        self.writers = set()
+        self.port = None
+        self._ready = threading.Event()
+
+    # --- жизненный цикл ---
+
+    def start(self):
+        threading.Thread(target=self._run, name="fake-bot-api", daemon=True).start()
+        self._ready.wait()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.update_event = asyncio.Event()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._handle_connection, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self.loop.run_forever()
+
+    def run_coroutine(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.run_coroutine(self._shutdown()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _shutdown(self):
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        await self.server.wait_closed()
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                # httpx кодирует ":" из токена в пути загрузки файлов
+                path = urllib.parse.unquote(path)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, content_type, payload = await self._route(path, headers.get("content-type", ""), body)
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def _route(self, path, content_type, body):
+        file_prefix = f"/file/bot{TOKEN}/"
+        api_prefix = f"/bot{TOKEN}/"
+        if path.startswith(file_prefix):
+            file_id = os.path.splitext(os.path.basename(path))[0]
+            data = self.files.get(file_id)
+            if data is None:
+                return "404 Not Found", "text/plain", b"not found"
+            self.calls["file_download"] += 1
+            return "200 OK", "application/octet-stream", data
+        if not path.startswith(api_prefix):
+            return "404 Not Found", "text/plain", b"not found"
+
+        method = path[len(api_prefix):]
+        params = self._parse_params(content_type, body)
+        self.calls[method] += 1
+        result = await self._call(method, params)
+        return "200 OK", "application/json", json.dumps({"ok": True, "result": result}).encode()
+
+    @staticmethod
+    def _parse_params(content_type, body):
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=HTTP).parsebytes(
+                b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+            )
+            params = {}
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if part.get_filename():
+                    params[name] = part.get_payload(decode=True)
+                else:
+                    params[name] = part.get_content()
+            return params
+        if content_type.startswith("application/json"):
+            return json.loads(body or b"{}")
+        return {k: v[0] for k, v in urllib.parse.parse_qs(body.decode()).items()}
+
+    # --- методы Bot API ---
+
+    async def _call(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self._get_updates(int(params.get("offset", 0)), float(params.get("timeout", 0)))
+        if method == "getFile":
+            file_id = params["file_id"]
+            return {
+                "file_id": file_id, "file_unique_id": file_id,
+                "file_size": len(self.files.get(file_id, b"")), "file_path": f"documents/{file_id}.zip",
+            }
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            chat_id = int(params["chat_id"])
+            message = {
+                "message_id": self.next_message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text") or params.get("caption", ""),
+            }
+            if method == "editMessageText":
+                message["message_id"] = int(params.get("message_id", 0))
+            self.next_message_id += 1
+            self._on_reply(chat_id, message)
+            return message
+        # answerCallbackQuery, deleteWebhook и прочие
+        return True
+
+    async def _get_updates(self, offset, timeout):
+        while self.pending and self.pending[0]["update_id"] < offset:
+            self.pending.popleft()
+        if not self.pending:
+            self.update_event.clear()
+            try:
+                await asyncio.wait_for(self.update_event.wait(), min(timeout, 1.0))
+            except asyncio.TimeoutError:
+                return []
+        return list(islice(self.pending, 100))
+
+    def _on_reply(self, chat_id, message):
+        waiter = self.waiters.get(chat_id)
+        if waiter is None or waiter.future.done():
+            return
+        waiter.messages.append(message)
+        if len(waiter.messages) >= waiter.expected:
+            waiter.future.set_result(time.perf_counter())
+
+    # --- симуляция пользователей ---
+
+    def _enqueue(self, payload):
+        payload["update_id"] = self.next_update_id
+        self.next_update_id += 1
+        self.pending.append(payload)
+        self.update_event.set()
+
+    async def step(self, name, user_id, payload, expected=1, timeout=30.0):
+        waiter = Waiter(self.loop.create_future(), expected)
+        self.waiters[user_id] = waiter
+        started = time.perf_counter()
+        self._enqueue(payload)
+        try:
+            finished = await asyncio.wait_for(waiter.future, timeout)
+            self.latencies[name].append(finished - started)
+        except asyncio.TimeoutError:
+            self.timeouts[name] += 1
+        finally:
+            del self.waiters[user_id]
+        return waiter.messages
+
+    @staticmethod
+    def _user(user_id, lang):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": lang}
+
+    def _message(self, user_id, lang, **fields):
+        message = {
+            "message_id": self.next_message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id, lang),
+        }
+        self.next_message_id += 1
+        message.update(fields)
+        return {"message": message}
+
+    def command(self, user_id, lang, text):
+        entity = {"type": "bot_command", "offset": 0, "length": len(text.split()[0])}
+        return self._message(user_id, lang, text=text, entities=[entity])
+
+    def document(self, user_id, lang):
+        file_id = f"zip{user_id}"
+        return self._message(user_id, lang, document={
+            "file_id": file_id, "file_unique_id": file_id, "file_name": f"certs_{user_id}.zip",
+            "mime_type": "application/zip", "file_size": len(self.files[file_id]),
+        })
+
+    def callback(self, user_id, lang, data, message):
+        return {"callback_query": {
+            "id": str(self.next_update_id), "from": self._user(user_id, lang),
+            "chat_instance": str(user_id), "data": data, "message": message,
+        }}
+
+    async def session(self, user_id, peer_id, delay):
+        await asyncio.sleep(delay)
+        lang = random.choice(["uk", "ru", "en"])
+        await self.step("start", user_id, self.command(user_id, lang, "/start"))
+        await self.step("upload_zip", user_id, self.document(user_id, lang))
+        await self.step("certs", user_id, self.command(user_id, lang, "/certs"))
+        await self.step("share", user_id, self.command(user_id, lang, f"/share {peer_id}"))
+        messages = await self.step("language", user_id, self.command(user_id, lang, "/language"))
+        if messages:
+            await self.step("lang_choice", user_id, self.callback(user_id, lang, "lang_en", messages[0]))
+        await self.step("certs_repeat", user_id, self.command(user_id, lang, "/certs"))
+        await self.step("unshare", user_id, self.command(user_id, lang, f"/unshare {peer_id}"))
+
+    def _step_stats(self, name, elapsed):
+        values = sorted(self.latencies[name])
+        return {
+            "count": len(values),
+            "timeouts": self.timeouts[name],
+            "throughput": len(values) / elapsed if name != "notify_now" else None,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+
+    async def simulate(self, users, ramp_up, notify_timeout):
+        user_ids = [FIRST_USER_ID + i for i in range(users)]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self.session(uid, user_ids[(i + 1) % users], ramp_up * i / users)
+            for i, uid in enumerate(user_ids)
+        ))
+        sessions_elapsed = time.perf_counter() - started
+
+        # Рассылка запускается после сессий, чтобы дайджесты не путались с ответами шагов
+        sent_before = self.calls["sendMessage"]
+        notify_started = time.perf_counter()
+        await self.step("notify_now", ADMIN_ID, self.command(ADMIN_ID, "en", "/notify_now"), expected=2, timeout=notify_timeout)
+        notify_elapsed = time.perf_counter() - notify_started
+        return {
+            "users": users,
+            "sessions_elapsed": sessions_elapsed,
+            "notify_elapsed": notify_elapsed,
+            "notify_messages": self.calls["sendMessage"] - sent_before - 2,
+            "steps": {name: self._step_stats(name, sessions_elapsed) for name in dict.fromkeys([*self.latencies, *self.timeouts])},
+            "api_calls": dict(self.calls),
+        }
+
+
+def print_report(report):
+    print(f"Пользователей: {report['users']}, сессии: {report['sessions_elapsed']:.2f} с")
+    total = sum(s["count"] for name, s in report["steps"].items() if name != "notify_now")
+    print(f"Общая пропускная способность: {total / report['sessions_elapsed']:.1f} апдейтов/с")
+    print(f"{'шаг':<14}{'кол-во':>8}{'таймауты':>10}{'апд/с':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}")
+    for name, s in report["steps"].items():
+        throughput = f"{s['throughput']:.1f}" if s["throughput"] is not None else "-"
+        print(f"{name:<14}{s['count']:>8}{s['timeouts']:>10}{throughput:>9}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}")
+    print(f"notify_now: {report['notify_elapsed']:.2f} с, отправлено дайджестов: {report['notify_messages']}")
+
+
+async def run(app, api, args):
+    async with app:
+        await app.start()
+        await app.updater.start_polling(poll_interval=0, timeout=1)
+        future = api.run_coroutine(api.simulate(args.users, args.ramp_up, args.notify_timeout))
+        report = await asyncio.wrap_future(future)
+        await app.updater.stop()
+        await app.stop()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с локальной подменой Bot API")
+    parser.add_argument("--users", type=int, default=200, help="количество симулированных пользователей")
+    parser.add_argument("--certs-per-zip", type=int, default=3, help="сертификатов в архиве каждого пользователя")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="секунд на постепенный старт всех сессий")
+    parser.add_argument("--concurrent-updates", type=int, default=1, help="параллельно обрабатываемых апдейтов")
+    parser.add_argument("--notify-timeout", type=float, default=600.0, help="таймаут ожидания /notify_now, с")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="не отключать ограничение частоты запросов")
+    parser.add_argument("--json", help="сохранить отчёт в JSON-файл")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    setup_logging(level=args.log_level)
+    workdir = tempfile.mkdtemp(prefix="certbot-loadtest-")
+    os.chdir(workdir)
+    logger.warning("Рабочий каталог с базой: %s", workdir)
+
+    user_ids = [FIRST_USER_ID + i for i in range(args.users)]
+    api = FakeBotApi(generate_archives(user_ids, args.certs_per_zip))
+    api.start()
+
+    from telegram.ext import ApplicationBuilder
+    import bot
+
+    if not args.keep_rate_limits:
+        bot.rate_limiter.limits = {}
+    bot.ADMIN_IDS.append(ADMIN_ID)
+    builder = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"http://127.0.0.1:{api.port}/bot")
+        .base_file_url(f"http://127.0.0.1:{api.port}/file/bot")
+        .concurrent_updates(args.concurrent_updates)
+    )
+    app = bot.build_application(builder)
+    report = asyncio.run(run(app, api, args))
+    api.stop()
+
+    print_report(report)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
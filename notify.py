@@ -1,42 +1,112 @@
-
-import sqlite3
 import asyncio
+import logging
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
 from datetime import datetime, timedelta
-from telegram import Bot
-from config import BOT_TOKEN
+from config import get_bot_token, DEFAULT_REMINDER_DAYS
+from db import iter_certificates_expiring_between, get_custom_reminder_days, parse_reminder_days
+from i18n import translations
+from utils import split_message
+from log_setup import setup_logging
+from leases import run_exclusive
+
+logger = logging.getLogger(__name__)
+
+_bot = None
 
-bot = Bot(token=BOT_TOKEN)
+def get_bot():
+    """Создаёт Bot при первом обращении; telegram импортируется только здесь."""
+    global _bot
+    if _bot is None:
+        from telegram import Bot
+        _bot = Bot(token=get_bot_token())
+    return _bot
 
-def get_users_with_cert_expiring(days_ahead: int):
-    conn = sqlite3.connect("certificates.db")
-    cursor = conn.cursor()
+def _(key, lang="ua"):
+    return translations.get(lang, translations["ua"]).get(key, key)
 
+def iter_digests(today=None):
+    """
+    Генератор дайджестов (telegram_id, lang, [(days_left, org, director, valid_to, revoked_at), ...])
+    по одному пользователю за раз. Строки приходят из одной диапазонной выборки,
+    покрывающей окна напоминаний всех пользователей, и уже упорядочены по владельцу
+    и сроку, поэтому в памяти держится только дайджест текущего пользователя.
+    """
     # Используем локальную дату, чтобы совпадать с локальным планировщиком
-    target_date = (datetime.now() + timedelta(days=days_ahead)).date()
-    like_prefix = f"{target_date.isoformat()}%"
-    cursor.execute('''
-        SELECT telegram_id, organization, director, valid_to
-        FROM certificates
-        WHERE valid_to LIKE ?
-    ''', (like_prefix,))
-    results = cursor.fetchall()
-    conn.close()
-    return results
-
-async def notify_users():
-    for days in [30, 7, 0]:
-        certs = get_users_with_cert_expiring(days)
-        for telegram_id, org, director, valid_to in certs:
-            valid_to = datetime.fromisoformat(valid_to).date()
-            if days == 0:
-                msg = f"⚠️ Сегодня истекает срок действия сертификата: 🏢 {org} 👤 {director}"
-            else:
-                msg = f"🔔 Через {days} дней истекает сертификат:🏢 {org} 👤 {director} ⏳ До: {valid_to}"
-
-            try:
-                await bot.send_message(chat_id=telegram_id, text=msg)
-            except Exception as e:
-                print(f"Ошибка отправки для {telegram_id}: {e}")
+    today = today or datetime.now().date()
+    windows = [DEFAULT_REMINDER_DAYS] + get_custom_reminder_days()
+    max_days = max((max(w) for w in windows if w), default=0)
+
+    rows = iter_certificates_expiring_between(today, today + timedelta(days=max_days + 1))
+    for telegram_id, user_rows in groupby(rows, key=itemgetter(0)):
+        items = []
+        lang = "ua"
+        for owner_id, org, director, valid_to, revoked_at, user_lang, reminder_raw in user_rows:
+            user_days = parse_reminder_days(reminder_raw) or DEFAULT_REMINDER_DAYS
+            valid_date = datetime.fromisoformat(valid_to).date()
+            days_left = (valid_date - today).days
+            if days_left in user_days:
+                items.append((days_left, org, director, valid_date, revoked_at))
+                lang = user_lang or "ua"
+        if items:
+            yield telegram_id, lang, items
+
+def render_digest(items, lang="ua"):
+    """Формирует текст дайджеста, разбитый на сообщения с учётом лимита Telegram."""
+    blocks = [_(key="digest_header", lang=lang).format(count=len(items))]
+    for days_left, org, director, valid_date, revoked_at in items:
+        key = "digest_item_today" if days_left == 0 else "digest_item"
+        block = _(key=key, lang=lang).format(
+            days=days_left, org=org, director=director, valid_date=valid_date.strftime("%d.%m.%Y")
+        )
+        if revoked_at:
+            block += "\n" + _(key="revoked_mark", lang=lang)
+        blocks.append(block)
+    return split_message(blocks)
+
+async def notify_revoked(revoked, bot=None):
+    """Сообщает владельцам о сертификатах, впервые найденных в CRL."""
+    bot = bot or get_bot()
+    by_user = defaultdict(list)
+    for telegram_id, org, director, lang in revoked:
+        by_user[(telegram_id, lang)].append(
+            _(key="revoked_item", lang=lang).format(org=org, director=director)
+        )
+    for (telegram_id, lang), blocks in by_user.items():
+        try:
+            for text in split_message([_(key="revoked_header", lang=lang)] + blocks):
+                await bot.send_message(chat_id=telegram_id, text=text)
+        except Exception as e:
+            logger.warning("Ошибка отправки уведомления об отзыве для %s: %s", telegram_id, e)
+
+async def notify_users(bot=None):
+    bot = bot or get_bot()
+    sent = 0
+    total = 0
+    for telegram_id, lang, items in iter_digests():
+        total += 1
+        try:
+            for text in render_digest(items, lang):
+                await bot.send_message(chat_id=telegram_id, text=text)
+            sent += 1
+        except Exception as e:
+            logger.warning("Ошибка отправки для %s: %s", telegram_id, e)
+    logger.info("Дайджесты отправлены %d из %d пользователей", sent, total)
+
+async def run_daily_notify(bot=None):
+    """
+    Ежедневная рассылка под арендой daily_notify: при нескольких репликах или
+    запуске из cron дайджесты за день отправляет ровно один экземпляр.
+    """
+    run_key = datetime.now().date().isoformat()
+    return await run_exclusive("daily_notify", lambda: notify_users(bot), run_key=run_key)
+
+async def run_standalone():
+    """Разовая рассылка вне приложения бота (cron, python cli.py notify)."""
+    async with get_bot() as bot:
+        await run_daily_notify(bot)
 
 if __name__ == "__main__":
-    asyncio.run(notify_users())
+    setup_logging()
+    asyncio.run(run_standalone())
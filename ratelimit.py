@@ -0,0 +1,94 @@
+import time
+from collections import Counter, OrderedDict
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated_at", "notified")
+
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate  # токенов в секунду
+        self.tokens = capacity
+        self.updated_at = now
+        # Уведомлён ли пользователь о текущей серии отклонённых запросов
+        self.notified = False
+
+    def consume(self, now):
+        """Списывает токен; возвращает 0 при успехе или сколько секунд ждать следующего."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.notified = False
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Ограничитель запросов по алгоритму token bucket, отдельный бюджет на каждую
+    пару (пользователь, категория). Состояние хранится в памяти; бакеты, которые
+    давно не использовались или вытеснены по лимиту max_entries, удаляются.
+    """
+
+    def __init__(self, limits, max_entries=10000, idle_ttl=3600):
+        # limits: {категория: (ёмкость, период в секундах)}
+        self.limits = limits
+        self.max_entries = max_entries
+        # Бакет, простоявший дольше своего периода, и так полон; удалять его раньше
+        # нельзя, иначе пересозданный бакет вернёт бюджет досрочно (например, 50/86400)
+        self.idle_ttl = max([idle_ttl] + [period for _, period in limits.values()])
+        self.buckets = OrderedDict()
+        self.allowed = Counter()
+        self.throttled = Counter()
+        self.evicted = 0
+
+    def check(self, user_id, category, now=None):
+        """Возвращает 0, если запрос разрешён, иначе время ожидания в секундах."""
+        if category not in self.limits:
+            return 0
+        now = time.monotonic() if now is None else now
+        key = (user_id, category)
+        bucket = self.buckets.get(key)
+        if bucket is None or now - bucket.updated_at > self.idle_ttl:
+            capacity, period = self.limits[category]
+            bucket = TokenBucket(capacity, capacity / period, now)
+            self.buckets[key] = bucket
+            # Заменённый устаревший бакет остаётся на старом месте в OrderedDict,
+            # поэтому переносим в конец, иначе _evict удалит его первым
+            self.buckets.move_to_end(key)
+            self._evict(now)
+        else:
+            self.buckets.move_to_end(key)
+
+        retry_after = bucket.consume(now)
+        if retry_after:
+            self.throttled[category] += 1
+        else:
+            self.allowed[category] += 1
+        return retry_after
+
+    def should_notify(self, user_id, category):
+        """True только для первого отклонённого запроса в серии, чтобы не спамить ответами."""
+        bucket = self.buckets.get((user_id, category))
+        if bucket is None or bucket.notified:
+            return False
+        bucket.notified = True
+        return True
+
+    def _evict(self, now):
+        # Самые старые бакеты в начале OrderedDict
+        while self.buckets:
+            key, bucket = next(iter(self.buckets.items()))
+            if len(self.buckets) <= self.max_entries and now - bucket.updated_at <= self.idle_ttl:
+                break
+            del self.buckets[key]
+            self.evicted += 1
+
+    def stats(self):
+        return {
+            "allowed": dict(self.allowed),
+            "throttled": dict(self.throttled),
+            "tracked": len(self.buckets),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# Модули бота лежат в корне репозитория, а не в пакете
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Модули работают с certificates.db в текущем каталоге
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def database(workdir):
+    from db import init_db
+    from list_cache import certificate_list_cache
+
+    init_db()
+    # Кеш списков глобальный: не переносим записи и версию между тестами
+    certificate_list_cache.invalidate_all()
+    certificate_list_cache.version = None
+    return workdir / "certificates.db"
@@ -0,0 +1,65 @@
+import gzip
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from backup import BackupError, create_backup
+
+# Отдельный процесс коммитит в базу каждые 10 мс, как работающий бот
+WRITER = """
+import sqlite3, time
+n = 0
+while True:
+    conn = sqlite3.connect("certificates.db")
+    conn.execute("UPDATE users SET reminder_days = ? WHERE telegram_id = 1", (str(n),))
+    conn.commit()
+    conn.close()
+    n += 1
+    time.sleep(0.01)
+"""
+
+
+@pytest.fixture
+def users(database):
+    conn = sqlite3.connect("certificates.db")
+    conn.executemany(
+        "INSERT INTO users (telegram_id, language, reminder_days) VALUES (?, 'ua', ?)",
+        ((i, "x" * 200) for i in range(1, 20001))
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def writer(users):
+    proc = subprocess.Popen([sys.executable, "-c", WRITER])
+    time.sleep(0.2)
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def test_backup_finishes_under_concurrent_writes(writer):
+    started = time.monotonic()
+    result = create_backup(backup_dir="backups", pages=16, pause=0.02, max_restarts=3, timeout=30)
+
+    assert time.monotonic() - started < 30
+    assert result["restarts"] >= 1
+    assert os.listdir("backups") == [result["name"]]
+    with gzip.open(result["path"]) as src, open("restored.db", "wb") as dst:
+        dst.write(src.read())
+    conn = sqlite3.connect("restored.db")
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 20000
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    conn.close()
+
+
+def test_backup_timeout_removes_temporary_files(writer):
+    with pytest.raises(BackupError):
+        create_backup(backup_dir="backups", pages=16, pause=0.02, max_restarts=10 ** 6, timeout=0.5)
+
+    assert os.listdir("backups") == []
@@ -0,0 +1,113 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from cert_parser import parse_certificate, parse_crl
+from db import insert_certificate, refresh_revocation_status, set_user_language, store_crl
+
+ISSUER = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Test CA")])
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def ca_key():
+    return ec.generate_private_key(ec.SECP256R1())
+
+
+@pytest.fixture
+def make_crl(ca_key, workdir):
+    def make(serials, number=None, this_update=NOW):
+        builder = (
+            x509.CertificateRevocationListBuilder()
+            .issuer_name(ISSUER)
+            .last_update(this_update)
+            .next_update(this_update + timedelta(days=7))
+        )
+        if number is not None:
+            builder = builder.add_extension(x509.CRLNumber(number), critical=False)
+        for serial in serials:
+            builder = builder.add_revoked_certificate(
+                x509.RevokedCertificateBuilder()
+                .serial_number(serial)
+                .revocation_date(this_update - timedelta(hours=1))
+                .build()
+            )
+        path = workdir / f"ca-{number}-{this_update:%Y%m%d%H%M%S}.crl"
+        path.write_bytes(builder.sign(ca_key, hashes.SHA256()).public_bytes(serialization.Encoding.DER))
+        return parse_crl(str(path))
+    return make
+
+
+@pytest.fixture
+def upload_certificate(ca_key, workdir):
+    def upload(owner_id, serial):
+        subject = x509.Name([
+            x509.NameAttribute(NameOID.ORGANIZATION_NAME, f"Org {serial}"),
+            x509.NameAttribute(NameOID.COMMON_NAME, f"Director {serial}"),
+        ])
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(subject)
+            .issuer_name(ISSUER)
+            .public_key(ca_key.public_key())
+            .serial_number(serial)
+            .not_valid_before(NOW - timedelta(days=1))
+            .not_valid_after(NOW + timedelta(days=365))
+            .sign(ca_key, hashes.SHA256())
+        )
+        path = workdir / f"{serial}.cer"
+        path.write_bytes(cert.public_bytes(serialization.Encoding.DER))
+        assert insert_certificate(parse_certificate(str(path)), owner_id, path.name)
+    return upload
+
+
+def indexed_serials():
+    conn = sqlite3.connect("certificates.db")
+    serials = {row[0] for row in conn.execute("SELECT serial FROM revoked_serials")}
+    conn.close()
+    return serials
+
+
+def test_crl_is_reindexed_only_when_number_grows(database, make_crl):
+    assert store_crl(make_crl([0xA], number=2)) == 1
+    assert store_crl(make_crl([0xA, 0xB], number=1)) is None
+    assert store_crl(make_crl([0xA, 0xB], number=2)) is None
+    assert indexed_serials() == {"A"}
+
+    assert store_crl(make_crl([0xB], number=3)) == 1
+    assert indexed_serials() == {"B"}
+
+
+def test_crl_without_number_falls_back_to_this_update(database, make_crl):
+    assert store_crl(make_crl([0xA])) == 1
+    assert store_crl(make_crl([0xA, 0xB])) is None
+    assert store_crl(make_crl([0xA, 0xB], this_update=NOW - timedelta(days=1))) is None
+
+    assert store_crl(make_crl([0xA, 0xB], this_update=NOW + timedelta(days=1))) == 2
+    assert indexed_serials() == {"A", "B"}
+
+
+def test_newly_revoked_certificates_are_reported_once(database, make_crl, upload_certificate):
+    set_user_language(7, "en")
+    upload_certificate(7, 0xA)
+    upload_certificate(7, 0xB)
+    store_crl(make_crl([0xA], number=1))
+
+    assert refresh_revocation_status() == [(7, "Org 10", "Director 10", "en")]
+    assert refresh_revocation_status() == []
+
+
+def test_certificate_revoked_at_upload_is_not_reported_again(database, make_crl, upload_certificate):
+    store_crl(make_crl([0xC], number=1))
+    upload_certificate(8, 0xC)
+
+    assert refresh_revocation_status() == []
+    conn = sqlite3.connect("certificates.db")
+    [(revoked_at,)] = conn.execute("SELECT revoked_at FROM certificates WHERE serial = 'C'")
+    conn.close()
+    assert revoked_at is not None
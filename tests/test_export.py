@@ -0,0 +1,54 @@
+import csv
+import io
+import sqlite3
+import zipfile
+
+import pytest
+
+from db import grant_access
+from export import build_export
+
+HOSTILE = {
+    "organization": '=HYPERLINK("http://evil.example","open")',
+    "director": "@SUM(1+1)",
+    "inn": "+380001",
+    "edrpou": "-12345",
+}
+
+
+@pytest.fixture
+def shared_certificate(database):
+    # Владелец 10 загрузил сертификат с формулами в субъекте и открыл доступ аудитору 20
+    conn = sqlite3.connect("certificates.db")
+    conn.execute(
+        "INSERT INTO certificates (telegram_id, organization, director, inn, edrpou, valid_from, valid_to, sha1) "
+        "VALUES (10, ?, ?, ?, ?, '2026-01-01T00:00:00', '2027-01-01T00:00:00', 'hostile')",
+        (HOSTILE["organization"], HOSTILE["director"], HOSTILE["inn"], HOSTILE["edrpou"])
+    )
+    conn.commit()
+    conn.close()
+    grant_access(owner_id=10, viewer_id=20)
+
+
+def test_csv_export_escapes_formulas(shared_certificate):
+    with build_export(20, "csv", lang="en") as fileobj:
+        rows = list(csv.reader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""), delimiter=";"))
+
+    [row] = rows[1:]
+    assert row[1:5] == ["'" + HOSTILE[key] for key in ("organization", "director", "inn", "edrpou")]
+
+
+def test_xlsx_export_stores_formulas_as_text(shared_certificate):
+    from openpyxl import load_workbook
+
+    with build_export(20, "xlsx", lang="en") as fileobj:
+        data = fileobj.read()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        sheets = [name for name in archive.namelist() if name.startswith("xl/worksheets/")]
+        assert all(b"<f>" not in archive.read(name) for name in sheets)
+
+    ws = load_workbook(io.BytesIO(data)).active
+    cells = list(ws.iter_rows(min_row=2, max_row=2))[0]
+    assert [cell.data_type for cell in cells[1:5]] == ["s"] * 4
+    assert [cell.value for cell in cells[1:5]] == ["'" + HOSTILE[key] for key in ("organization", "director", "inn", "edrpou")]
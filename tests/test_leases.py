@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+
+import bot
+from db import acquire_lease, get_lease_state
+from leases import lease_retry_delay
+
+
+class FakeJobQueue:
+    def __init__(self):
+        self.scheduled = []
+
+    def run_once(self, callback, when, name=None):
+        self.scheduled.append((callback, when))
+
+
+class FakeContext:
+    def __init__(self):
+        self.job_queue = FakeJobQueue()
+
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def test_retry_delay_waits_for_dead_holder_lease():
+    assert acquire_lease("daily", "dead-leader", ttl=30, run_key="2026-10-19") is not None
+
+    delay = lease_retry_delay("daily", "2026-10-19")
+
+    assert 30 <= delay <= 31 + 1
+
+
+def test_no_retry_after_run_key_is_recorded():
+    runs = []
+
+    async def job():
+        runs.append(1)
+
+    asyncio.run(bot.run_daily_exclusive(FakeContext(), "daily", job, run_key="2026-10-19"))
+
+    assert runs == [1]
+    assert lease_retry_delay("daily", "2026-10-19") is None
+
+
+def test_standby_takes_over_after_leader_dies():
+    runs = []
+
+    async def job():
+        runs.append(1)
+
+    # Лидер взял аренду и умер, не освободив её и не записав run_key
+    acquire_lease("daily", "dead-leader", ttl=0.2, run_key="2026-10-19")
+    context = FakeContext()
+    asyncio.run(bot.run_daily_exclusive(context, "daily", job, run_key="2026-10-19"))
+    assert runs == []
+    [(retry, when)] = context.job_queue.scheduled
+    assert when > 0
+
+    time.sleep(0.3)
+    asyncio.run(retry(context))
+
+    assert runs == [1]
+    assert get_lease_state("daily")[1] == "2026-10-19"
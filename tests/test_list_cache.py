@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+from db import delete_expired_certificates, grant_access, sync_list_cache
+from list_cache import certificate_list_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def cache_page(user_id):
+    sync_list_cache()
+    certificate_list_cache.put(user_id, "ua", date.today(), ["page"])
+
+
+def test_local_write_keeps_other_users_pages():
+    cache_page(1)
+    cache_page(2)
+
+    grant_access(owner_id=3, viewer_id=1)
+    sync_list_cache()
+
+    assert certificate_list_cache.get(1, "ua", date.today()) is None
+    assert certificate_list_cache.get(2, "ua", date.today()) == ["page"]
+
+
+def test_write_from_other_process_resets_cache():
+    cache_page(2)
+    resets = certificate_list_cache.stats()["external_resets"]
+
+    subprocess.run(
+        [sys.executable, "-c", "import db; db.grant_access(3, 1)"],
+        check=True, env={**os.environ, "PYTHONPATH": ROOT},
+    )
+    sync_list_cache()
+
+    assert certificate_list_cache.get(2, "ua", date.today()) is None
+    assert certificate_list_cache.stats()["external_resets"] == resets + 1
+
+
+def test_local_cleanup_is_not_counted_as_external_reset():
+    conn = sqlite3.connect("certificates.db")
+    conn.execute("INSERT INTO certificates (telegram_id, organization, valid_to, sha1) VALUES (1, 'Old', '2000-01-01T00:00:00', 'old')")
+    conn.commit()
+    conn.close()
+    cache_page(2)
+    resets = certificate_list_cache.stats()["external_resets"]
+
+    assert delete_expired_certificates() == 1
+    sync_list_cache()
+
+    assert certificate_list_cache.stats()["external_resets"] == resets
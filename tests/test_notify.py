@@ -0,0 +1,99 @@
+import asyncio
+import sqlite3
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+import notify
+from db import get_user_reminder_days, set_user_language, set_user_reminder_days
+from i18n import translations
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def certificates(database, monkeypatch):
+    monkeypatch.setattr(notify, "DEFAULT_REMINDER_DAYS", [30, 7, 0])
+    set_user_language(1, "ua")
+    set_user_language(2, "en")
+    set_user_reminder_days(2, [14, 1])
+    set_user_language(3, "ru")
+
+    rows = [(1, 30), (1, 7), (1, 0), (1, 14), (1, 31), (2, 14), (2, 7), (2, 1), (3, 5)]
+    conn = sqlite3.connect("certificates.db")
+    conn.executemany(
+        "INSERT INTO certificates (telegram_id, organization, director, valid_to, sha1) VALUES (?, ?, ?, ?, ?)",
+        (
+            (user_id, f"Org {user_id}-{days}", f"Director {user_id}", (TODAY + timedelta(days=days)).isoformat(), f"{user_id}-{days}")
+            for user_id, days in rows
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def digest_days(digests):
+    return [(telegram_id, lang, [item[0] for item in items]) for telegram_id, lang, items in digests]
+
+
+def test_one_digest_per_user_with_own_windows(certificates):
+    digests = list(notify.iter_digests(TODAY))
+
+    # Пользователь 1 — окна по умолчанию, 2 — свои (14, 1), у 3 совпадений нет
+    assert digest_days(digests) == [(1, "ua", [0, 7, 30]), (2, "en", [1, 14])]
+
+
+def test_render_digest_is_translated(certificates):
+    digests = dict((telegram_id, (lang, items)) for telegram_id, lang, items in notify.iter_digests(TODAY))
+    lang, items = digests[2]
+
+    [text] = notify.render_digest(items, lang)
+
+    en = translations["en"]
+    assert text.startswith(en["digest_header"].format(count=2))
+    assert "Org 2-1" in text and "Org 2-14" in text
+
+
+def test_render_digest_splits_long_digest():
+    items = [(0, "Org " + "x" * 300, "Director", TODAY, None)] * 40
+
+    messages = notify.render_digest(items, "ua")
+
+    assert len(messages) > 1
+    assert all(len(message) <= 4096 for message in messages)
+    assert sum(message.count("Org ") for message in messages) == 40
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def run_reminders(user_id, args):
+    message = FakeMessage()
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=message)
+    asyncio.run(bot.reminders_cmd(update, SimpleNamespace(args=args)))
+    return message.replies
+
+
+def test_reminders_cmd_stores_sorted_windows(database):
+    set_user_language(5, "en")
+
+    [reply] = run_reminders(5, ["7", "30", "7", "0"])
+
+    assert get_user_reminder_days(5) == [30, 7, 0]
+    assert reply == translations["en"]["reminders_set"].format(days="30, 7, 0")
+
+
+def test_reminders_cmd_rejects_out_of_range(database):
+    set_user_language(5, "en")
+
+    [reply] = run_reminders(5, ["400"])
+
+    assert get_user_reminder_days(5) == []
+    assert reply == translations["en"]["reminders_invalid"].format(max_days=bot.MAX_REMINDER_DAYS)
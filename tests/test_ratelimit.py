@@ -0,0 +1,47 @@
+from ratelimit import RateLimiter
+
+LIMITS = {"command": (2, 10)}
+
+
+def test_returning_user_is_not_evicted_before_stale_buckets():
+    limiter = RateLimiter(LIMITS, max_entries=3, idle_ttl=10)
+    for user_id in (1, 2, 3):
+        limiter.check(user_id, "command", now=0)
+
+    # Бакет пользователя 1 устарел и пересоздаётся, но он самый свежий
+    limiter.check(1, "command", now=20)
+    limiter.check(4, "command", now=21)
+
+    assert list(limiter.buckets) == [(1, "command"), (4, "command")]
+    assert limiter.evicted == 2
+
+
+def test_recreated_bucket_keeps_spent_budget():
+    limiter = RateLimiter(LIMITS, max_entries=3, idle_ttl=10)
+    for user_id in (1, 2, 3):
+        limiter.check(user_id, "command", now=0)
+    limiter.check(1, "command", now=20)
+    limiter.check(1, "command", now=20)
+    limiter.check(4, "command", now=21)
+
+    assert limiter.check(1, "command", now=21) > 0
+
+
+def test_eviction_by_size_removes_least_recently_used():
+    limiter = RateLimiter(LIMITS, max_entries=2, idle_ttl=3600)
+    limiter.check(1, "command", now=0)
+    limiter.check(2, "command", now=1)
+    limiter.check(1, "command", now=2)
+    limiter.check(3, "command", now=3)
+
+    assert list(limiter.buckets) == [(1, "command"), (3, "command")]
+
+
+def test_idle_ttl_does_not_refill_budget_before_period_ends():
+    limiter = RateLimiter({"upload": (2, 86400)}, idle_ttl=3600)
+    limiter.check(1, "upload", now=0)
+    limiter.check(1, "upload", now=1)
+
+    # Через два часа бюджет на сутки ещё не восстановился
+    assert limiter.check(1, "upload", now=7200) > 0
+    assert limiter.idle_ttl == 86400
@@ -0,0 +1,32 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from db import init_db, iter_all_user_ids, set_user_language
+from user_registry import UserRegistry
+
+
+def test_migration_backfills_last_seen_for_existing_users(workdir):
+    conn = sqlite3.connect("certificates.db")
+    conn.execute("CREATE TABLE users (telegram_id INTEGER PRIMARY KEY, language TEXT DEFAULT 'ua', reminder_days TEXT)")
+    conn.executemany("INSERT INTO users (telegram_id) VALUES (?)", [(1,), (2,)])
+    conn.commit()
+    conn.close()
+
+    init_db()
+
+    month_ago = datetime.utcnow() - timedelta(days=30)
+    assert list(iter_all_user_ids(active_since=month_ago)) == [1, 2]
+
+
+def test_flush_keeps_chosen_language(database):
+    set_user_language(1, "ru")
+    registry = UserRegistry()
+    registry.touch(1, "en")
+    registry.touch(2, "en")
+
+    assert registry.flush() == 2
+    assert registry.stats() == {"pending": 0, "flushes": 1, "flushed_users": 2}
+    conn = sqlite3.connect("certificates.db")
+    rows = conn.execute("SELECT telegram_id, language, last_seen IS NOT NULL FROM users ORDER BY telegram_id").fetchall()
+    conn.close()
+    assert rows == [(1, "ru", 1), (2, "en", 1)]
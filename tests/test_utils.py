@@ -0,0 +1,14 @@
+from utils import MAX_MESSAGE_LENGTH, split_message
+
+
+def test_blocks_are_joined_up_to_the_limit():
+    assert split_message(["a" * 10, "b" * 10, "c" * 10], limit=25) == ["a" * 10 + "\n\n" + "b" * 10, "c" * 10]
+
+
+def test_oversized_block_is_cut_at_the_limit():
+    big = "x" * (MAX_MESSAGE_LENGTH + 904)
+
+    messages = split_message(["head", big, "tail"])
+
+    assert messages == ["head", "x" * MAX_MESSAGE_LENGTH, "x" * 904 + "\n\ntail"]
+    assert all(len(message) <= MAX_MESSAGE_LENGTH for message in messages)
@@ -0,0 +1,79 @@
+import logging
+import threading
+from datetime import datetime
+
+import db
+
+logger = logging.getLogger(__name__)
+
+KNOWN_LANGUAGES = ("ua", "ru", "en")
+
+
+def normalize_language(language_code):
+    """Язык интерфейса по language_code из Telegram; неизвестные языки — украинский."""
+    return language_code if language_code in KNOWN_LANGUAGES else "ua"
+
+
+class UserRegistry:
+    """
+    Буфер записи (write-behind) регистраций и активности пользователей.
+    Обработчики только отмечают пользователя в памяти, а flush() периодически
+    пишет всё накопленное одной транзакцией (db.flush_user_activity).
+    Язык из Telegram применяется лишь при первой регистрации.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushes = 0
+        self.flushed_users = 0
+
+    def touch(self, user_id, language_code=None):
+        seen = datetime.utcnow().isoformat(timespec="seconds")
+        with self.lock:
+            previous = self.pending.get(user_id)
+            language = previous[0] if previous else normalize_language(language_code)
+            self.pending[user_id] = (language, seen)
+
+    def get_user_language(self, user_id):
+        # До ближайшего flush новый пользователь есть только в буфере
+        language = db.get_user_language(user_id, default=None)
+        if language is not None:
+            return language
+        with self.lock:
+            pending = self.pending.get(user_id)
+        return pending[0] if pending else "ua"
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return 0
+        try:
+            db.flush_user_activity(batch)
+        except Exception:
+            # Возвращаем пачку в буфер, более свежие отметки из буфера не затираем
+            with self.lock:
+                for user_id, entry in batch.items():
+                    self.pending.setdefault(user_id, entry)
+            raise
+        with self.lock:
+            self.flushes += 1
+            self.flushed_users += len(batch)
+        logger.debug("Записана активность %d пользователей", len(batch))
+        return len(batch)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending": len(self.pending),
+                "flushes": self.flushes,
+                "flushed_users": self.flushed_users,
+            }
+
+
+user_registry = UserRegistry()
+
+
+def get_user_language(user_id):
+    return user_registry.get_user_language(user_id)
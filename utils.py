@@ -13,3 +13,29 @@ def extract_zip(file_path, extract_to):
 
 def is_certificate_file(filename):
     return filename.lower().endswith(('.cer', '.crt', '.pem'))
+
+# Лимит длины одного сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+def split_message(blocks, limit=MAX_MESSAGE_LENGTH, separator="\n\n"):
+    """Собирает блоки текста в сообщения, не превышающие limit символов."""
+    messages = []
+    current = ""
+    for block in blocks:
+        # Один блок длиннее лимита режем принудительно
+        while len(block) > limit:
+            if current:
+                messages.append(current)
+                current = ""
+            messages.append(block[:limit])
+            block = block[limit:]
+        if not current:
+            current = block
+        elif len(current) + len(separator) + len(block) <= limit:
+            current += separator + block
+        else:
+            messages.append(current)
+            current = block
+    if current:
+        messages.append(current)
+    return messages